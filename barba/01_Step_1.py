@@ -3,6 +3,9 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -217,6 +220,40 @@ def _(mo):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    The loop above updates one grid point at a time, which is the clearest way to see the discretization but slow for fine grids.  The module `navier_stokes.py` in this folder has the same update written with whole-array operations: `ns.linear_convection(u, c, dt, dx, nt)` advances `u` in place by `nt` steps.  The function below uses it to run Step 1 on any number of grid points, keeping $\Delta t = \sigma \Delta x / c$ so that it stays stable.
+    """)
+    return
+
+
+@app.function
+def simulate(nx, nt=25, c=1, sigma=.5):
+    dx = 2 / (nx - 1)
+    u = ns.hat((nx,), dx)
+    return ns.linear_convection(u, c, sigma * dx / c, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _start = _time.perf_counter()
+    simulate(1_000_001)
+    print(f"1,000,001 points, 25 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
@@ -3,6 +3,9 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -134,6 +137,40 @@ def _(mo):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    The nonlinear update is also available as `ns.nonlinear_convection(u, dt, dx, nt)` in `navier_stokes.py`, which works on the whole array at once instead of point by point.
+    """)
+    return
+
+
+@app.function
+def simulate(nx, nt=20, sigma=.5):
+    dx = 2 / (nx - 1)
+    u = ns.hat((nx,), dx)
+    return ns.nonlinear_convection(u, sigma * dx, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _start = _time.perf_counter()
+    simulate(1_000_001)
+    print(f"1,000,001 points, 20 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
@@ -3,6 +3,10 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+    import sweep
+
 
 @app.cell
 def _():
@@ -150,6 +154,63 @@ def _():
             u[i] = un[i] + nu * dt / dx**2 * (un[i+1] - 2 * un[i] + un[i-1])
         
     pyplot.plot(numpy.linspace(0, 2, nx), u);
+    return numpy, pyplot
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    `ns.diffusion(u, nu, dt, dx, nt)` in `navier_stokes.py` is the diffusion update above applied to the whole array in place.  Note that $\Delta t = \sigma \Delta x^2 / \nu$ shrinks with the square of the grid spacing, so fine grids need many more steps to reach the same time.
+    """)
+    return
+
+
+@app.function
+def simulate(nx, nt=20, nu=.3, sigma=.2):
+    dx = 2 / (nx - 1)
+    u = ns.hat((nx,), dx)
+    return ns.diffusion(u, nu, sigma * dx**2 / nu, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _start = _time.perf_counter()
+    simulate(1_000_001)
+    print(f"1,000,001 points, 20 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    To see how the result depends on $\nu$, $\sigma$ and the grid, we don't have to edit the cell above and re-run it for each value.  `sweep.sweep` in `sweep.py` takes lists of values and runs every combination.  Runs on the same grid are stacked and advanced together by a single call to `ns.diffusion`, and runs on different grids go to separate processes.  It returns a table with one row per run, holding the final `u` and the time each run took.
+    """)
+    return
+
+
+@app.cell
+def _():
+    runs = sweep.sweep("diffusion", nu=[.1, .2, .3], sigma=[.1, .2, .4], nx=[41, 81])
+    runs.select("nx", "nu", "sigma", "batch", "seconds")
+    return (runs,)
+
+
+@app.cell
+def _(numpy, pyplot, runs):
+    for _row in runs.filter(runs["nx"] == 81).iter_rows(named=True):
+        pyplot.plot(numpy.linspace(0, 2, 81), _row["u"], label=f"nu={_row['nu']}, sigma={_row['sigma']}")
+    pyplot.legend()
     return
 
 
@@ -3,6 +3,9 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -316,6 +319,41 @@ def _(numpy, pyplot, u_1, u_analytical, x_1):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ### Using the solver module
+
+    `ns.burgers(u, nu, dt, dx, nt)` in `navier_stokes.py` performs the loop above, periodic boundary included, with whole-array operations.  It takes the initial condition as an array, so we can still build it with `ufunc`.
+    """)
+    return
+
+
+@app.function
+def simulate(u, dx, nt=100, nu=.07):
+    return ns.burgers(u, nu, dx * nu, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, numpy, run_timings, ufunc):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _nx = 1_000_001
+    _x = numpy.linspace(0, 2 * numpy.pi, _nx)
+    _u = numpy.asarray(ufunc(0, _x, .07), dtype=float)
+    _start = _time.perf_counter()
+    simulate(_u, 2 * numpy.pi / (_nx - 1))
+    print(f"{_nx:,} points, 100 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
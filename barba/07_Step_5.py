@@ -3,6 +3,9 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -292,6 +295,40 @@ def _(X, Y, c, cm, dt, dx, dy, nt, numpy, nx, ny, pyplot):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    The array version of this step is `ns.linear_convection_2d(u, c, dt, dx, dy, nt)` in `navier_stokes.py`.  Besides avoiding the nested loops, it does not allocate new arrays inside the time loop, which matters once the grid has millions of points.
+    """)
+    return
+
+
+@app.function
+def simulate(n, nt=100, c=1, sigma=.2):
+    dx = 2 / (n - 1)
+    u = ns.hat((n, n), dx, dx)
+    return ns.linear_convection_2d(u, c, sigma * dx, dx, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _start = _time.perf_counter()
+    simulate(1025)
+    print(f"1025 x 1025 grid, 100 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
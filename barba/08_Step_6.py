@@ -3,6 +3,9 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -222,6 +225,41 @@ def _(cm, numpy, pyplot, v, x, y):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    `ns.convection_2d(u, v, dt, dx, dy, nt)` in `navier_stokes.py` advances both velocity components together, exactly as the array-operation cell above does.
+    """)
+    return
+
+
+@app.function
+def simulate(n, nt=80, sigma=.2):
+    dx = 2 / (n - 1)
+    u = ns.hat((n, n), dx, dx)
+    v = ns.hat((n, n), dx, dx)
+    return ns.convection_2d(u, v, sigma * dx, dx, dx, nt)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _start = _time.perf_counter()
+    simulate(1025)
+    print(f"1025 x 1025 grid, 80 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
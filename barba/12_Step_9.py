@@ -3,6 +3,12 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import time
+
+    import navier_stokes as ns
+    import spectral
+
 
 @app.cell
 def _():
@@ -299,6 +305,89 @@ def _(mo):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    `ns.laplace2d(p, y, dx, dy, l1norm_target)` in `navier_stokes.py` is the function `laplace2d` above.  The number of iterations it needs grows with the number of grid points along each side, so finer grids take much longer to converge.
+
+    `ns.laplace2d_sor(p, y, dx, dy, l1norm_target)` converges far faster.  It updates `p` in place, first at the points where $i + j$ is even and then, using those new values, at the points where it is odd, and pushes each update past the Jacobi value by a factor $\omega$ between 1 and 2.  The best $\omega$ depends only on the grid, so `ns.optimal_omega` computes it.  Checking the norm costs about as much as a sweep, so it is only checked every ten sweeps.  The function returns `p` and the number of sweeps it took.  Stopping when a Jacobi sweep would change `p` by less than `l1norm_target`, it needs a few hundred sweeps where `laplace2d` needs thousands, and its answer is much closer to the converged one.
+
+    SOR still needs more sweeps the finer the grid, though.  With $p$ fixed at $x = 0$ and $x = 2$ and copied at $y = 0$ and $y = 1$, Laplace's equation is one that `spectral.laplace_solver` solves exactly, with Fourier transforms, as in Step 10.  `ns.laplace2d_solve(p, y, dx, dy, l1norm_target, solver)` sets the boundary values, calls the solver and applies the same test as `laplace2d_sor`, returning `p` and the number of solves, which is one.  The cell below times all three to `l1norm_target` $= 10^{-4}$ on grids from $31 \times 31$ to $1025 \times 1025$, with the sweeps SOR took and the speed-up of the spectral solver over Jacobi.  Jacobi takes minutes on the two largest grids, so it is only run there when you press the button.
+    """)
+    return
+
+
+@app.function
+def simulate(p, y, l1norm_target=1e-4):
+    ny, nx = p.shape
+    return ns.laplace2d(p, y, 2 / (nx - 1), 2 / (ny - 1), l1norm_target)
+
+
+@app.cell
+def _(numpy):
+    def time_laplace(n, jacobi=True, l1norm_target=1e-4):
+        """Time Step 9 on an n x n grid by SOR, spectrally and, if *jacobi*, by Jacobi."""
+        y = numpy.linspace(0, 1, n)
+        dx = 2 / (n - 1)
+
+        def grid():
+            p = numpy.zeros((n, n))
+            p[:, -1] = y
+            return p
+
+        row = f"{n:>5}"
+        if jacobi:
+            start = time.perf_counter()
+            simulate(grid(), y, l1norm_target)
+            slow = time.perf_counter() - start
+            row += f" {slow:9.3f} s"
+        else:
+            row += f" {'-':>11}"
+        start = time.perf_counter()
+        _, sweeps = ns.laplace2d_sor(grid(), y, dx, dx, l1norm_target)
+        row += f" {time.perf_counter() - start:9.3f} s {sweeps:6}"
+        start = time.perf_counter()
+        solver = spectral.laplace_solver((n, n), dx, dx)
+        _, solves = ns.laplace2d_solve(grid(), y, dx, dx, l1norm_target, solver)
+        fast = time.perf_counter() - start
+        row += f" {fast:9.4f} s {solves:6}"
+        if jacobi:
+            row += f" {slow / fast:8.0f}x"
+        return row
+
+    laplace_header = (
+        f"{'n':>5} {'Jacobi':>11} {'SOR':>11} {'sweeps':>6} "
+        f"{'spectral':>11} {'solves':>6} {'speed-up':>9}"
+    )
+    return laplace_header, time_laplace
+
+
+@app.cell
+def _(laplace_header, time_laplace):
+    print(laplace_header)
+    for _n in (31, 61, 121, 241, 513, 1025):
+        print(time_laplace(_n, jacobi=_n <= 241))
+    return
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time Jacobi on the two largest grids")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(laplace_header, mo, run_timings, time_laplace):
+    mo.stop(not run_timings.value)
+    print(laplace_header)
+    for _n in (513, 1025):
+        print(time_laplace(_n))
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
@@ -3,6 +3,14 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import tempfile
+    import time
+
+    import multigrid
+    import navier_stokes as ns
+    import snapshots
+
 
 @app.cell
 def _():
@@ -477,6 +485,99 @@ def _(X, Y, cm, p_2, pyplot, u_2, v_2):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    `navier_stokes.py` has `build_up_b`, `pressure_poisson` and `cavity_flow` with the same arguments as the functions above, so `ns.cavity_flow(nt, u, v, dt, dx, dy, p, rho, nu)` runs this step on any grid.  On a fine grid the time step has to shrink too: $\nu \Delta t / \Delta x^2$ must stay below 1/4.
+    """)
+    return
+
+
+@app.function
+def simulate(u, v, p, nt, dt=.001, rho=1, nu=.1, nit=50, pressure_solver=None):
+    ny, nx = u.shape
+    dx, dy = 2 / (nx - 1), 2 / (ny - 1)
+    return ns.cavity_flow(nt, u, v, dt, dx, dy, p, rho, nu, nit, pressure_solver)
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, numpy, run_timings):
+    mo.stop(not run_timings.value)
+    _n = 1025
+    _dt = .25 * (2 / (_n - 1))**2 / .1
+    _start = time.perf_counter()
+    simulate(numpy.zeros((_n, _n)), numpy.zeros((_n, _n)), numpy.zeros((_n, _n)), 10, _dt)
+    print(f"{_n} x {_n} grid, 10 steps: {time.perf_counter() - _start:.2f} s")
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    Fifty Jacobi iterations per time step are enough on the $41 \times 41$ grid, but each iteration only passes information one grid point further, so on finer grids the pressure is nowhere near converged after `nit` iterations.  `multigrid.py` solves the same pressure Poisson equation, with the same boundary conditions, by working on a sequence of coarser grids; it iterates until the residual is small, and the work that takes grows only in proportion to the number of grid points.  Passing it as `pressure_solver` replaces the `nit` Jacobi iterations:
+    """)
+    return
+
+
+@app.cell
+def _(mo, numpy, run_timings):
+    mo.stop(not run_timings.value)
+    _n = 513
+    _dx = 2 / (_n - 1)
+    _dt = .25 * _dx**2 / .1
+    _solver = multigrid.cavity_solver((_n, _n), _dx, _dx)
+    _start = time.perf_counter()
+    simulate(
+        numpy.zeros((_n, _n)), numpy.zeros((_n, _n)), numpy.zeros((_n, _n)), 20, _dt,
+        pressure_solver=_solver,
+    )
+    print(f"{_n} x {_n} grid, 20 steps: {time.perf_counter() - _start:.2f} s, "
+          f"{_solver.cycles} V-cycles in the last pressure solve")
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    The plots above show only the last time step; to see how the flow develops we would have to run it again for every time we want to look at.  Passing a `snapshots.Writer` as `recorder` saves every `every`-th step of `u`, `v` and `p` to files on disk as the run goes, and `snapshots.read` maps them back without loading them, so a frame is read from disk only when it is plotted:
+    """)
+    return
+
+
+@app.cell
+def _(dt, dx, dy, mo, nu, nx, ny, numpy, rho):
+    _directory = tempfile.mkdtemp()
+    with snapshots.Writer(_directory, (ny, nx), frames=51, every=10) as _writer:
+        ns.cavity_flow(
+            500, numpy.zeros((ny, nx)), numpy.zeros((ny, nx)), dt, dx, dy,
+            numpy.zeros((ny, nx)), rho, nu, recorder=_writer,
+        )
+    recorded = snapshots.read(_directory)
+    frame = mo.ui.slider(0, len(recorded) - 1, value=len(recorded) - 1, label="frame")
+    frame
+    return frame, recorded
+
+
+@app.cell
+def _(X, Y, cm, frame, pyplot, recorded):
+    _p, _u, _v = (recorded[_name][frame.value] for _name in "puv")
+    pyplot.figure(figsize=(11, 7), dpi=100)
+    pyplot.contourf(X, Y, _p, alpha=0.5, cmap=cm.viridis)
+    pyplot.colorbar()
+    pyplot.quiver(X[::2, ::2], Y[::2, ::2], _u[::2, ::2], _v[::2, ::2])
+    pyplot.title(f"t = {recorded.times[frame.value]:.3f}")
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
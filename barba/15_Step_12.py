@@ -3,6 +3,10 @@ import marimo
 __generated_with = "0.20.4"
 app = marimo.App()
 
+with app.setup:
+    import multigrid
+    import navier_stokes as ns
+
 
 @app.cell
 def _():
@@ -402,6 +406,75 @@ def _(X, Y, pyplot, u, v):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    ## Using the solver module
+
+    `ns.channel_flow(u, v, p, dt, dx, dy, rho, nu, F)` in `navier_stokes.py` runs the loop above and returns the velocity, the pressure and the number of steps taken.  It also accepts `max_steps`, to stop early on grids where reaching a steady state would take too long, and `pressure_solver`, to solve for the pressure with `multigrid.channel_solver(p.shape, dx, dy)` instead of `nit` Jacobi iterations (see Step 11), or to solve it exactly with `spectral.channel_solver(p.shape, dx, dy)` (see Step 10).
+    """)
+    return
+
+
+@app.function
+def simulate(
+    u, v, p, dt=.01, rho=1, nu=.1, F=1, nit=50, max_steps=None, pressure_solver=None
+):
+    ny, nx = u.shape
+    dx, dy = 2 / (nx - 1), 2 / (ny - 1)
+    return ns.channel_flow(
+        u, v, p, dt, dx, dy, rho, nu, F, nit,
+        max_steps=max_steps, pressure_solver=pressure_solver,
+    )
+
+
+@app.cell
+def _(mo):
+    run_timings = mo.ui.run_button(label="Time the solver on a large grid")
+    run_timings
+    return (run_timings,)
+
+
+@app.cell
+def _(mo, numpy, run_timings):
+    mo.stop(not run_timings.value)
+    import time as _time
+    _n = 1025
+    _dt = .25 * (2 / (_n - 1))**2 / .1
+    _start = _time.perf_counter()
+    simulate(
+        numpy.zeros((_n, _n)), numpy.zeros((_n, _n)), numpy.ones((_n, _n)),
+        dt=_dt, max_steps=10,
+        pressure_solver=multigrid.channel_solver((_n, _n), 2 / (_n - 1), 2 / (_n - 1)),
+    )
+    print(f"{_n} x {_n} grid, 10 steps: {_time.perf_counter() - _start:.2f} s")
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""
+    The test `udiff > .001` stops the loop when the *sum* of $u$ changes slowly, which is not the same as $u$ changing slowly: the run above stops with a largest velocity of about 3.5, while the flow keeps accelerating towards the steady value of 5.  Passing `monitor=ns.SteadyState(tol, every)` to `ns.channel_flow` measures $\max|u^{n+1} - u^n|$ and its root-mean-square instead, while $u^{n+1}$ is computed, every `every` steps, and stops once $\max|u^{n+1} - u^n| / \Delta t \le$ `tol`.  The monitor keeps the history of both norms.
+    """)
+    return
+
+
+@app.cell
+def _(numpy, pyplot):
+    _monitor = ns.SteadyState(tol=1e-4, every=10)
+    _u, _v, _p, _steps = ns.channel_flow(
+        numpy.zeros((41, 41)), numpy.zeros((41, 41)), numpy.zeros((41, 41)),
+        .01, .05, .05, 1, .1, 1, monitor=_monitor,
+    )
+    print(f"steady after {_steps} steps, largest u = {_u.max():.4f}")
+    _step, _rms, _largest = zip(*_monitor.history)
+    pyplot.semilogy(_step, _rms, label="rms")
+    pyplot.semilogy(_step, _largest, label="max")
+    pyplot.xlabel("step")
+    pyplot.legend()
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
@@ -0,0 +1,466 @@
+"""Geometric multigrid for the pressure-Poisson equations of Steps 9-12.
+
+Usage:
+    import multigrid
+    import navier_stokes as ns
+
+    solver = multigrid.cavity_solver(p.shape, dx, dy)     # Step 11 boundaries
+    solver.solve(p, b)                  # p updated in place
+    solver.cycles, solver.residual      # V-cycles taken, final RMS residual
+
+    ns.cavity_flow(nt, u, v, dt, dx, dy, p, rho, nu, pressure_solver=solver)
+
+The notebooks relax p_xx + p_yy = b with a fixed number of Jacobi sweeps
+(nit = 50) per time step.  Jacobi removes error on the scale of a few grid
+cells quickly but needs of order n^2 sweeps for error spanning an n x n
+grid, so on a fine grid 50 sweeps leave the pressure far from converged.
+Multigrid smooths on the fine grid and removes the remaining smooth error
+on successively coarser grids, where it is no longer smooth; a V-cycle
+costs a few fine-grid sweeps and cuts the residual by a factor of four or
+more whatever the grid size, so a solve to a fixed tolerance is O(N).
+
+PoissonSolver solves the same discrete equations as the notebooks' Jacobi
+loops, with the same boundary conditions:
+
+- "dirichlet": the boundary row or column of p keeps the value it has
+- "neumann":   the boundary row or column is a copy of its neighbour
+- "periodic":  every column is unknown and the last neighbours the first
+
+Each side of the grid can be Dirichlet or Neumann independently; periodic
+applies to both sides of an axis.  When no side is Dirichlet the pressure
+is fixed only up to a constant: the mean of b is then removed (it cannot be
+satisfied) and the mean of p is left unchanged.
+
+The grid is coarsened by two along each axis for as long as it can be:
+along a bounded axis the n - 2 unknowns must be odd, and along a periodic
+axis the n unknowns must be even.  Grids with n - 1 (bounded) or n
+(periodic) a power of two therefore coarsen all the way; on other sizes
+the coarsest grid, solved directly, is larger and a cycle costs more.  A
+grid whose coarsest level would still have more than MAX_DIRECT unknowns
+(n = 500, say, which cannot be coarsened at all) is rejected with a
+ValueError rather than relaxed there, which would converge too slowly to
+be of use.  Smoothing is red-black Gauss-Seidel and all work arrays are allocated
+once, when the solver is created.
+"""
+
+import warnings
+
+import numpy
+
+DIRICHLET = "dirichlet"
+NEUMANN = "neumann"
+PERIODIC = "periodic"
+
+MAX_DIRECT = 2048  # largest coarsest grid (in unknowns) solved directly
+
+
+# ---------------------------------------------------------------------------
+# Boundary conditions
+# ---------------------------------------------------------------------------
+
+def _sides(bc) -> tuple | str:
+    """Normalize a boundary condition to PERIODIC or a (low, high) pair."""
+    if bc == PERIODIC:
+        return PERIODIC
+    sides = (bc, bc) if isinstance(bc, str) else tuple(bc)
+    for side in sides:
+        if side not in (DIRICHLET, NEUMANN):
+            raise ValueError(f"unknown boundary condition {side!r}")
+    return sides
+
+
+def _unknowns(bc) -> slice:
+    """Which rows or columns of p are solved for along an axis."""
+    return slice(None) if bc == PERIODIC else slice(1, -1)
+
+
+def _coarsens(m: int, bc) -> bool:
+    if bc == PERIODIC:
+        return m % 2 == 0 and m >= 4
+    return m % 2 == 1 and m >= 5
+
+
+def _coarse_size(m: int, bc) -> int:
+    return m // 2 if bc == PERIODIC else (m - 1) // 2
+
+
+def boundary_width(depth: int) -> float:
+    """Width, in grid spacings, of the boundary cell next to a Neumann side
+    after the axis has been coarsened *depth* times.
+
+    On the finest grid the notebooks' copy rule puts the zero-flux boundary
+    half a spacing beyond the first unknown, which is then the centre of a
+    cell one spacing wide.  Coarse points keep their positions, so on a
+    coarse grid that first cell reaches from the boundary to halfway to the
+    next point and is wider than one (coarse) spacing.
+    """
+    return 1.5 - 0.5 / 2**depth
+
+
+# ---------------------------------------------------------------------------
+# Grid transfer, along the last axis (pass .T for the first)
+# ---------------------------------------------------------------------------
+
+def _restrict(a, out, bc, depth=0) -> None:
+    """Full weighting: out[I] = (a[2I-1] + 2 a[2I] + a[2I+1]) / 4, fine-grid
+    points 2I and coarse points I counted from the boundary.
+
+    Next to a Neumann side the weights are those of the boundary cells,
+    *depth* being how often the fine axis has already been coarsened.
+    """
+    if a.shape[-1] == out.shape[-1]:
+        numpy.copyto(out, a)
+    elif bc == PERIODIC:
+        numpy.multiply(a[..., 0::2], 0.5, out=out)
+        out += 0.25 * a[..., 1::2]
+        out[..., 1:] += 0.25 * a[..., 1:-1:2]
+        out[..., 0] += 0.25 * a[..., -1]
+    else:
+        numpy.multiply(a[..., 1::2], 0.5, out=out)
+        out += 0.25 * a[..., 0:-1:2]
+        out += 0.25 * a[..., 2::2]
+        fine, coarse = boundary_width(depth), boundary_width(depth + 1)
+        for side, (edge, inner, next_) in zip(bc, ((0, 1, 2), (-1, -2, -3))):
+            if side == NEUMANN:
+                out[..., edge] = (
+                    fine * a[..., edge] + a[..., inner] + 0.5 * a[..., next_]
+                ) / (2 * coarse)
+
+
+def _prolong(c, out, bc) -> None:
+    """Linear interpolation of the coarse correction *c* onto *out*."""
+    if c.shape[-1] == out.shape[-1]:
+        numpy.copyto(out, c)
+    elif bc == PERIODIC:
+        out[..., 0::2] = c
+        numpy.add(c[..., :-1], c[..., 1:], out=out[..., 1:-1:2])
+        numpy.add(c[..., -1], c[..., 0], out=out[..., -1])
+        out[..., 1::2] *= 0.5
+    else:
+        out[..., 1::2] = c
+        numpy.add(c[..., :-1], c[..., 1:], out=out[..., 2:-1:2])
+        out[..., 2:-1:2] *= 0.5
+        # The correction is zero on a Dirichlet boundary and flat across a
+        # Neumann one.
+        out[..., 0] = c[..., 0] * (0.5 if bc[0] == DIRICHLET else 1.0)
+        out[..., -1] = c[..., -1] * (0.5 if bc[1] == DIRICHLET else 1.0)
+
+
+# ---------------------------------------------------------------------------
+# One grid level
+# ---------------------------------------------------------------------------
+
+class Level:
+    """Work arrays and stencil views for one grid of the hierarchy.
+
+    *u* is padded with one ghost cell on every side, so its interior
+    u[1:-1, 1:-1] holds the unknowns; *f* is the right-hand side.  *depth*
+    counts how often each axis, (y, x), has been coarsened to get here.
+    """
+
+    def __init__(self, shape: tuple, dx: float, dy: float, x, y, depth=(0, 0)):
+        self.shape = shape
+        self.dx, self.dy = dx, dy
+        self.x, self.y = x, y
+        self.depth = depth
+        # A Neumann ghost is set to u0 + beta (u1 - u0), u0 being the point
+        # next to it and u1 the one after, which gives the flux across the
+        # boundary cell the width of that cell (beta = 0 on the finest grid).
+        self._betas = tuple(1 / boundary_width(d) - 1 for d in depth)
+        my, mx = shape
+        self.u = numpy.zeros((my + 2, mx + 2))
+        self.f = numpy.zeros(shape)
+        self.r = numpy.empty(shape)
+        self.scratch = numpy.empty(shape)
+        dx2, dy2 = dx**2, dy**2
+        self._coefs = (dy2, dx2, dx2 * dy2, 1 / (2 * (dx2 + dy2)))
+        # Red points have j + i even, black points j + i odd; each colour
+        # is two strided sub-lattices of the interior.
+        self._colours = [
+            [self._sublattice(sj, (sj + colour) % 2) for sj in (0, 1)]
+            for colour in (0, 1)
+        ]
+
+    def _sublattice(self, sj: int, si: int) -> tuple:
+        u, (my, mx) = self.u, self.shape
+        rows, cols = slice(1 + sj, my + 1, 2), slice(1 + si, mx + 1, 2)
+        north, south = slice(2 + sj, my + 2, 2), slice(sj, my, 2)
+        east, west = slice(2 + si, mx + 2, 2), slice(si, mx, 2)
+        centre = u[rows, cols]
+        return (
+            centre,
+            u[rows, east],
+            u[rows, west],
+            u[north, cols],
+            u[south, cols],
+            self.f[sj::2, si::2],
+            numpy.empty_like(centre),
+            numpy.empty_like(centre),
+        )
+
+    def fill_ghosts(self) -> None:
+        """Set the Neumann and periodic ghost cells from the unknowns.
+
+        Dirichlet ghosts hold fixed values and are left alone.
+        """
+        beta_y, beta_x = self._betas
+        for u, bc, beta in ((self.u, self.x, beta_x), (self.u.T, self.y, beta_y)):
+            if bc == PERIODIC:
+                u[:, 0] = u[:, -2]
+                u[:, -1] = u[:, 1]
+                continue
+            if bc[0] == NEUMANN:
+                u[:, 0] = u[:, 1]
+                if beta:
+                    u[:, 0] += beta * (u[:, 2] - u[:, 1])
+            if bc[1] == NEUMANN:
+                u[:, -1] = u[:, -2]
+                if beta:
+                    u[:, -1] += beta * (u[:, -3] - u[:, -2])
+
+    def relax(self, omega: float = 1.0) -> None:
+        """One red-black Gauss-Seidel sweep, over-relaxed by *omega*."""
+        dy2, dx2, dx2dy2, scale = self._coefs
+        for colour in self._colours:
+            self.fill_ghosts()
+            for centre, east, west, north, south, f, new, tmp in colour:
+                numpy.add(east, west, out=new)
+                new *= dy2
+                numpy.add(north, south, out=tmp)
+                tmp *= dx2
+                new += tmp
+                numpy.multiply(f, dx2dy2, out=tmp)
+                new -= tmp
+                new *= scale
+                if omega == 1.0:
+                    numpy.copyto(centre, new)
+                else:
+                    new -= centre
+                    new *= omega
+                    centre += new
+
+    def residual(self) -> numpy.ndarray:
+        """Compute r = f - (u_xx + u_yy) into self.r and return it."""
+        u, r, s = self.u, self.r, self.scratch
+        self.fill_ghosts()
+        centre = u[1:-1, 1:-1]
+        numpy.add(u[1:-1, 2:], u[1:-1, :-2], out=r)
+        r -= centre
+        r -= centre
+        r /= self.dx**2
+        numpy.add(u[2:, 1:-1], u[:-2, 1:-1], out=s)
+        s -= centre
+        s -= centre
+        s /= self.dy**2
+        r += s
+        numpy.subtract(self.f, r, out=r)
+        return r
+
+    def matrix(self) -> numpy.ndarray:
+        """The operator u -> u_xx + u_yy on this level as a dense matrix.
+
+        Dirichlet ghosts are taken as zero, as they are for corrections.
+        """
+        n = self.f.size
+        a = numpy.zeros((n, n))
+        index = numpy.arange(n).reshape(self.shape)
+        beta_y, beta_x = self._betas
+        axes = ((1, self.dx, self.x, beta_x), (0, self.dy, self.y, beta_y))
+        for axis, h, bc, beta in axes:
+            coef = 1 / h**2
+            numpy.add.at(a, (index, index), -2 * coef)
+            # The west (or south) neighbour, then the east (or north) one.
+            for side, step, edge, inner in ((0, 1, 0, 1), (1, -1, -1, -2)):
+                neighbour = numpy.roll(index, step, axis=axis)
+                if bc == PERIODIC:
+                    numpy.add.at(a, (index, neighbour), coef)
+                    continue
+                inside = numpy.ones(self.shape, dtype=bool)
+                inside[(slice(None),) * axis + (edge,)] = False
+                numpy.add.at(a, (index[inside], neighbour[inside]), coef)
+                if bc[side] == NEUMANN:
+                    first = numpy.take(index, edge, axis=axis)
+                    second = numpy.take(index, inner, axis=axis)
+                    numpy.add.at(a, (first, first), (1 - beta) * coef)
+                    numpy.add.at(a, (first, second), beta * coef)
+        return a
+
+
+# ---------------------------------------------------------------------------
+# Solver
+# ---------------------------------------------------------------------------
+
+class PoissonSolver:
+    """Multigrid V-cycles for p_xx + p_yy = b on a fixed grid.
+
+    *shape* is the shape of p, boundary rows and columns included, and *x*
+    and *y* give the boundary conditions along each axis (see the module
+    docstring).  solve() stops when the RMS residual falls to *tol* times
+    the larger of the RMS of b and the initial residual, or after
+    *max_cycles* V-cycles; the numbers it reached are left in `cycles` and
+    `residual`, and a RuntimeWarning is issued if the cycles ran out first.
+    """
+
+    def __init__(
+        self,
+        shape: tuple,
+        dx: float,
+        dy: float,
+        x=DIRICHLET,
+        y=DIRICHLET,
+        tol: float = 1e-6,
+        max_cycles: int = 50,
+        smoothing: int = 2,
+    ):
+        self.x, self.y = _sides(x), _sides(y)
+        self.tol = tol
+        self.max_cycles = max_cycles
+        self.smoothing = smoothing
+        self.rows, self.cols = _unknowns(self.y), _unknowns(self.x)
+        self.singular = DIRICHLET not in (*self.x, *self.y)
+        self.cycles = 0
+        self.residual = 0.0
+
+        ny, nx = shape
+        shape = (
+            ny if self.y == PERIODIC else ny - 2,
+            nx if self.x == PERIODIC else nx - 2,
+        )
+        depth = (0, 0)
+        self.levels = [Level(shape, dx, dy, self.x, self.y)]
+        while True:
+            my, mx = shape
+            # Point smoothing copes badly with strongly anisotropic grids,
+            # so an axis is coarsened only while its spacing is less than
+            # twice the smaller one.
+            h = min(dx, dy)
+            coarser_y = _coarsens(my, self.y) and dy < 2 * h
+            coarser_x = _coarsens(mx, self.x) and dx < 2 * h
+            if not (coarser_y or coarser_x):
+                break
+            shape = (
+                _coarse_size(my, self.y) if coarser_y else my,
+                _coarse_size(mx, self.x) if coarser_x else mx,
+            )
+            dx, dy = dx * (1 + coarser_x), dy * (1 + coarser_y)
+            depth = (depth[0] + coarser_y, depth[1] + coarser_x)
+            self.levels.append(Level(shape, dx, dy, self.x, self.y, depth))
+        # Buffers between each level and the next, for restricting along x
+        # before y and for prolonging along y before x.
+        self._between = [
+            (
+                numpy.empty((fine.shape[0], coarse.shape[1])),
+                numpy.empty((fine.shape[0], coarse.shape[1])),
+            )
+            for fine, coarse in zip(self.levels, self.levels[1:])
+        ]
+        coarsest = self.levels[-1]
+        if coarsest.f.size > MAX_DIRECT:
+            raise ValueError(
+                f"a {ny} x {nx} grid coarsens only to {coarsest.shape[0]} x "
+                f"{coarsest.shape[1]} unknowns, more than MAX_DIRECT = "
+                f"{MAX_DIRECT}; use a size with n - 1 (bounded) or n "
+                f"(periodic) a power of two times a small number"
+            )
+        # The cut-off drops the zero singular value of a singular operator,
+        # which round-off leaves at around 1e-12 of the largest.
+        self._inverse = numpy.linalg.pinv(coarsest.matrix(), rcond=1e-10)
+
+    def solve(self, p: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+        """Solve p_xx + p_yy = b in place, starting from the current p."""
+        fine = self.levels[0]
+        interior = fine.u[1:-1, 1:-1]
+        interior[...] = p[self.rows, self.cols]
+        fine.f[...] = b[self.rows, self.cols]
+        self._set_dirichlet(fine.u, p)
+        if self.singular:
+            fine.f -= fine.f.mean()
+            mean = interior.mean()
+
+        scale = numpy.sqrt(fine.f.size)
+        self.cycles = 0
+        self.residual = numpy.linalg.norm(fine.residual()) / scale
+        target = self.tol * max(numpy.linalg.norm(fine.f) / scale, self.residual)
+        while self.residual > target and self.cycles < self.max_cycles:
+            self._vcycle(0)
+            self.cycles += 1
+            self.residual = numpy.linalg.norm(fine.residual()) / scale
+        if self.residual > target:
+            warnings.warn(
+                f"no convergence after {self.cycles} V-cycles: residual "
+                f"{self.residual:.3g} > {target:.3g}",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+        if self.singular:
+            interior += mean - interior.mean()
+        p[self.rows, self.cols] = interior
+        self._copy_neumann(p)
+        return p
+
+    def _vcycle(self, k: int) -> None:
+        level = self.levels[k]
+        if k == len(self.levels) - 1:
+            self._solve_coarsest(level)
+            return
+        for _ in range(self.smoothing):
+            level.relax()
+        residual = level.residual()
+        coarse = self.levels[k + 1]
+        along_x, along_y = self._between[k]
+        depth_y, depth_x = level.depth
+        _restrict(residual, along_x, self.x, depth_x)
+        _restrict(along_x.T, coarse.f.T, self.y, depth_y)
+        coarse.u.fill(0)
+        self._vcycle(k + 1)
+        _prolong(coarse.u[1:-1, 1:-1].T, along_y.T, self.y)
+        _prolong(along_y, level.scratch, self.x)
+        level.u[1:-1, 1:-1] += level.scratch
+        for _ in range(self.smoothing):
+            level.relax()
+
+    def _solve_coarsest(self, level: Level) -> None:
+        # As a correction, so that this also holds when the finest grid is
+        # the coarsest and its Dirichlet ghosts are not zero.
+        correction = self._inverse @ level.residual().ravel()
+        level.u[1:-1, 1:-1] += correction.reshape(level.shape)
+
+    def _set_dirichlet(self, u, p) -> None:
+        if self.x != PERIODIC:
+            if self.x[0] == DIRICHLET:
+                u[1:-1, 0] = p[self.rows, 0]
+            if self.x[1] == DIRICHLET:
+                u[1:-1, -1] = p[self.rows, -1]
+        if self.y != PERIODIC:
+            if self.y[0] == DIRICHLET:
+                u[0, 1:-1] = p[0, self.cols]
+            if self.y[1] == DIRICHLET:
+                u[-1, 1:-1] = p[-1, self.cols]
+
+    def _copy_neumann(self, p) -> None:
+        # In the notebooks' order: columns first, then rows.
+        if self.x != PERIODIC:
+            if self.x[0] == NEUMANN:
+                p[:, 0] = p[:, 1]
+            if self.x[1] == NEUMANN:
+                p[:, -1] = p[:, -2]
+        if self.y != PERIODIC:
+            if self.y[0] == NEUMANN:
+                p[0, :] = p[1, :]
+            if self.y[1] == NEUMANN:
+                p[-1, :] = p[-2, :]
+
+
+# ---------------------------------------------------------------------------
+# The boundary conditions of the notebooks
+# ---------------------------------------------------------------------------
+
+def cavity_solver(shape: tuple, dx: float, dy: float, **kwargs) -> PoissonSolver:
+    """Step 11: dp/dx = 0 at x = 0 and 2, dp/dy = 0 at y = 0, p = 0 at y = 2."""
+    return PoissonSolver(shape, dx, dy, x=NEUMANN, y=(NEUMANN, DIRICHLET), **kwargs)
+
+
+def channel_solver(shape: tuple, dx: float, dy: float, **kwargs) -> PoissonSolver:
+    """Step 12: periodic in x, dp/dy = 0 at y = 0 and 2."""
+    return PoissonSolver(shape, dx, dy, x=PERIODIC, y=NEUMANN, **kwargs)
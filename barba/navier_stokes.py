@@ -0,0 +1,954 @@
+"""Vectorized solvers for the 12 steps to Navier–Stokes.
+
+Usage:
+    import navier_stokes as ns
+
+    u = ns.hat((1025, 1025), dx, dy)
+    ns.diffuse(u, nu, dt, dx, dy, nt)           # Step 7 on a 1025 x 1025 grid
+    u, v, p = ns.cavity_flow(nt, u, v, dt, dx, dy, p, rho, nu)   # Step 11
+
+The notebooks develop each step with loops and slices written inline in
+their cells, which is the right way to learn the discretization but the
+wrong way to run it on a large grid.  This module collects the same
+updates as functions that the notebooks call through `@app.function`:
+
+- Steps 1-4 (1-D):  linear_convection, nonlinear_convection, diffusion, burgers
+- Steps 5-8 (2-D):  linear_convection_2d, convection_2d, diffuse, burgers_2d
+- adaptive steps:   stable_dt, advance_to (Steps 1-8)
+- Steps 9-10:       laplace2d, laplace2d_sor, laplace2d_solve, poisson2d
+- Steps 11-12:      build_up_b, pressure_poisson, pressure_poisson_periodic,
+                    cavity_flow, channel_flow, SteadyState
+- precision:        precision_report
+
+Arrays are indexed [j, i], i.e. (y, x), as in the notebooks, and every
+solver updates its arrays in place and returns them.  The explicit updates
+and Jacobi sweeps neither allocate nor copy inside the time loop: each
+solver keeps its fields in a DoubleBuffer, a second copy of every field
+made once before the loop, and swaps the two each step.  Every term is
+written from one copy into the other, or into one scratch array, with
+NumPy's `out=` arguments.  The momentum and pressure-source expressions
+of Steps 11 and 12 are evaluated the same way, with coefficients and
+scratch arrays set up once per grid and time step.
+
+The solvers of Steps 1-8 index space from the front, so they also
+advance a stack of fields along a trailing batch axis, u[..., k] being
+run k, with coefficients such as nu and dt given as arrays along that
+axis; sweep.py uses this to run many parameter sets at once.
+
+Every solver computes in the dtype of the arrays it is given, so arrays
+made with dtype=numpy.float32 halve the memory traffic that limits these
+stencils.  diffuse, laplace2d, cavity_flow and channel_flow also take a
+dtype argument, to compute in float32 on float64 arrays.  Sums and norms
+used to decide when to stop are accumulated in float64 either way, and
+precision_report() measures how far a float32 run is from float64.
+
+Boundaries periodic in x (Steps 4 and 12) use the same stencils as the
+interior, with the neighbours of the first and last columns taken from
+the other end of the row.
+"""
+
+import inspect
+import time
+
+import numpy
+
+# ---------------------------------------------------------------------------
+# Initial conditions and stencil helpers
+# ---------------------------------------------------------------------------
+
+def hat(
+    shape: tuple, dx: float, dy: float | None = None, dtype=numpy.float64
+) -> numpy.ndarray:
+    """Return the hat function used in Steps 1-8: 2 on [0.5, 1], 1 elsewhere.
+
+    *shape* is (nx,) for a 1-D grid or (ny, nx) for a 2-D grid.
+    """
+    u = numpy.ones(shape, dtype=dtype)
+    xs = slice(int(0.5 / dx), int(1 / dx + 1))
+    if len(shape) == 1:
+        u[xs] = 2
+    else:
+        u[int(0.5 / dy) : int(1 / dy + 1), xs] = 2
+    return u
+
+
+def sawtooth(x: numpy.ndarray, nu) -> numpy.ndarray:
+    """Return the initial condition of Step 4 at the points *x* in [0, 2 pi].
+
+    This is -2 nu phi_x / phi + 4 at t = 0, written so that it neither
+    overflows nor divides by zero when nu is small.
+    """
+    return 4 + x - numpy.pi * (1 - numpy.tanh(numpy.pi * (numpy.pi - x) / (2 * nu)))
+
+
+def _subtract_upwind(out, centre, behind, speed, coef, scratch, first=False):
+    """out -= coef * speed * (centre - behind), without temporaries.
+
+    If *first*, out is set to centre minus that term instead, so that it
+    need not already hold a copy of centre.
+    """
+    numpy.subtract(centre, behind, out=scratch)
+    scratch *= speed
+    scratch *= coef
+    if first:
+        numpy.subtract(centre, scratch, out=out)
+    else:
+        out -= scratch
+
+
+def _add_second_difference(out, lo, centre, hi, coef, scratch, first=False):
+    """out += coef * (hi - 2 * centre + lo), without temporaries.
+
+    *first* works as in _subtract_upwind().
+    """
+    numpy.add(lo, hi, out=scratch)
+    scratch -= centre
+    scratch -= centre
+    scratch *= coef
+    if first:
+        numpy.add(centre, scratch, out=out)
+    else:
+        out += scratch
+
+
+def _add_laplacian(f, fn, cx, cy, scratch, first=False):
+    """f[1:-1, 1:-1] += cx * (fn_E - 2 fn + fn_W) + cy * (fn_N - 2 fn + fn_S)."""
+    interior, centre = f[1:-1, 1:-1], fn[1:-1, 1:-1]
+    _add_second_difference(
+        interior, fn[1:-1, :-2], centre, fn[1:-1, 2:], cx, scratch, first
+    )
+    _add_second_difference(interior, fn[:-2, 1:-1], centre, fn[2:, 1:-1], cy, scratch)
+
+
+def _set_walls(f, value):
+    f[0, :] = value
+    f[-1, :] = value
+    f[:, 0] = value
+    f[:, -1] = value
+
+
+def _column_segments(periodic_x: bool) -> list[tuple[slice, slice, slice]]:
+    """(columns, west neighbours, east neighbours) covering a stencil update.
+
+    Without periodicity only the interior columns are updated.  With it the
+    first and last columns are updated too, their missing neighbour taken
+    from the other end of the row.
+    """
+    segments = [(slice(1, -1), slice(0, -2), slice(2, None))]
+    if periodic_x:
+        segments.append((slice(-1, None), slice(-2, -1), slice(0, 1)))
+        segments.append((slice(0, 1), slice(-1, None), slice(1, 2)))
+    return segments
+
+
+class DoubleBuffer:
+    """Two copies of each field, swapped rather than copied every step.
+
+    Usage:
+        buffers = DoubleBuffer(u, v)
+        for _ in range(nt):
+            (u, v), (un, vn) = buffers.swap()
+            ...                 # write the new u and v from un and vn
+        buffers.finish()        # the original arrays now hold the last step
+
+    Both copies start out equal, so values that no step writes, such as a
+    fixed boundary, are the same in each.  The arrays returned for writing
+    hold the step before last, so every other point must be rewritten by
+    the stencil or the boundary conditions on every step.  After finish()
+    the buffers can be used again for more steps.
+
+    If *dtype* is given and differs from that of the fields, both copies
+    are made in *dtype* and finish() converts the result back, so that a
+    solver can compute in float32 on float64 arrays.
+
+    The solvers of Steps 1-8 take a DoubleBuffer of their fields as an
+    optional *buffers* argument, so that a caller taking one step at a time
+    (advance_to) can reuse the copies and scratch arrays on every call.
+    While *held* is true, finish() leaves the last step where it is.
+    """
+
+    def __init__(self, *fields: numpy.ndarray, dtype=None):
+        self.fields = fields
+        self.converted = dtype is not None and any(f.dtype != dtype for f in fields)
+        if self.converted:
+            self.current = tuple(f.astype(dtype) for f in fields)
+        else:
+            self.current = fields
+        self.previous = tuple(numpy.copy(f) for f in self.current)
+        self.held = False
+        self._scratch = {}
+
+    def scratch(self, like: numpy.ndarray, count: int = 1) -> list:
+        """*count* arrays shaped like *like*, made on first use and then reused."""
+        key = (like.shape, like.dtype, count)
+        if key not in self._scratch:
+            self._scratch[key] = [numpy.empty_like(like) for _ in range(count)]
+        return self._scratch[key]
+
+    def swap(self) -> tuple[tuple, tuple]:
+        """Start a step: return (arrays to write, arrays of the last step)."""
+        self.current, self.previous = self.previous, self.current
+        return self.current, self.previous
+
+    def finish(self) -> tuple:
+        """Leave the last step in the original arrays and return them.
+
+        While the buffers are held, return the arrays of the last step
+        without copying them instead.
+        """
+        if self.held:
+            return self.current
+        if self.current is not self.fields:
+            for field, latest in zip(self.fields, self.current):
+                numpy.copyto(field, latest, casting="same_kind")
+            if not self.converted:
+                self.current, self.previous = self.fields, self.current
+        return self.fields
+
+
+# ---------------------------------------------------------------------------
+# Steps 1-4: one dimension
+# ---------------------------------------------------------------------------
+
+def linear_convection(u, c, dt, dx, nt, buffers=None):
+    """Step 1: advance u_t + c u_x = 0 by *nt* steps; u[0] stays fixed."""
+    buffers = buffers or DoubleBuffer(u)
+    (scratch,) = buffers.scratch(u[1:])
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        _subtract_upwind(u[1:], un[1:], un[:-1], c, dt / dx, scratch, first=True)
+    return buffers.finish()[0]
+
+
+def nonlinear_convection(u, dt, dx, nt, buffers=None):
+    """Step 2: advance u_t + u u_x = 0 by *nt* steps; u[0] stays fixed."""
+    buffers = buffers or DoubleBuffer(u)
+    (scratch,) = buffers.scratch(u[1:])
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        _subtract_upwind(u[1:], un[1:], un[:-1], un[1:], dt / dx, scratch, first=True)
+    return buffers.finish()[0]
+
+
+def diffusion(u, nu, dt, dx, nt, buffers=None):
+    """Step 3: advance u_t = nu u_xx by *nt* steps; the end points stay fixed."""
+    buffers = buffers or DoubleBuffer(u)
+    (scratch,) = buffers.scratch(u[1:-1])
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        _add_second_difference(
+            u[1:-1], un[:-2], un[1:-1], un[2:], nu * dt / dx**2, scratch, first=True
+        )
+    return buffers.finish()[0]
+
+
+def burgers(u, nu, dt, dx, nt, buffers=None):
+    """Step 4: advance u_t + u u_x = nu u_xx by *nt* steps, periodic in x.
+
+    The last point duplicates the first (x = 0 and x = 2 pi), so the
+    update runs over u[:-1] with u[-2] as the left neighbour of u[0].
+    """
+    buffers = buffers or DoubleBuffer(u)
+    west, scratch = buffers.scratch(u[:-1], 2)
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        west[0] = un[-2]
+        west[1:] = un[:-2]
+        _subtract_upwind(u[:-1], un[:-1], west, un[:-1], dt / dx, scratch, first=True)
+        _add_second_difference(u[:-1], west, un[:-1], un[1:], nu * dt / dx**2, scratch)
+        u[-1] = u[0]
+    return buffers.finish()[0]
+
+
+# ---------------------------------------------------------------------------
+# Steps 5-8: two dimensions
+# ---------------------------------------------------------------------------
+
+def linear_convection_2d(u, c, dt, dx, dy, nt, boundary=1.0, buffers=None):
+    """Step 5: advance u_t + c (u_x + u_y) = 0 by *nt* steps."""
+    buffers = buffers or DoubleBuffer(u)
+    (scratch,) = buffers.scratch(u[1:, 1:])
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        uc = un[1:, 1:]
+        _subtract_upwind(u[1:, 1:], uc, un[1:, :-1], c, dt / dx, scratch, first=True)
+        _subtract_upwind(u[1:, 1:], uc, un[:-1, 1:], c, dt / dy, scratch)
+        _set_walls(u, boundary)
+    return buffers.finish()[0]
+
+
+def convection_2d(u, v, dt, dx, dy, nt, boundary=1.0, buffers=None):
+    """Step 6: advance the nonlinear convection of (u, v) by *nt* steps."""
+    buffers = buffers or DoubleBuffer(u, v)
+    (scratch,) = buffers.scratch(u[1:, 1:])
+    for _ in range(nt):
+        (u, v), (un, vn) = buffers.swap()
+        uc, vc = un[1:, 1:], vn[1:, 1:]
+        for f, fn in ((u, un), (v, vn)):
+            fc, out = fn[1:, 1:], f[1:, 1:]
+            _subtract_upwind(out, fc, fn[1:, :-1], uc, dt / dx, scratch, first=True)
+            _subtract_upwind(out, fc, fn[:-1, 1:], vc, dt / dy, scratch)
+            _set_walls(f, boundary)
+    return buffers.finish()
+
+
+def diffuse(u, nu, dt, dx, dy, nt, boundary=1.0, dtype=None, buffers=None):
+    """Step 7: advance u_t = nu (u_xx + u_yy) by *nt* steps.
+
+    If *dtype* is given the steps are computed in it (see DoubleBuffer).
+    """
+    buffers = buffers or DoubleBuffer(u, dtype=dtype)
+    (scratch,) = buffers.scratch(buffers.current[0][1:-1, 1:-1])
+    for _ in range(nt):
+        (u,), (un,) = buffers.swap()
+        _add_laplacian(u, un, nu * dt / dx**2, nu * dt / dy**2, scratch, first=True)
+        _set_walls(u, boundary)
+    return buffers.finish()[0]
+
+
+def burgers_2d(u, v, nu, dt, dx, dy, nt, boundary=1.0, buffers=None):
+    """Step 8: advance 2-D Burgers' equation for (u, v) by *nt* steps."""
+    buffers = buffers or DoubleBuffer(u, v)
+    (scratch,) = buffers.scratch(u[1:-1, 1:-1])
+    for _ in range(nt):
+        (u, v), (un, vn) = buffers.swap()
+        uc, vc = un[1:-1, 1:-1], vn[1:-1, 1:-1]
+        for f, fn in ((u, un), (v, vn)):
+            fc, out = fn[1:-1, 1:-1], f[1:-1, 1:-1]
+            _subtract_upwind(out, fc, fn[1:-1, :-2], uc, dt / dx, scratch, first=True)
+            _subtract_upwind(out, fc, fn[:-2, 1:-1], vc, dt / dy, scratch)
+            _add_laplacian(f, fn, nu * dt / dx**2, nu * dt / dy**2, scratch)
+            _set_walls(f, boundary)
+    return buffers.finish()
+
+
+# ---------------------------------------------------------------------------
+# Adaptive time steps for Steps 1-8
+# ---------------------------------------------------------------------------
+
+# Solvers whose fields are the velocities that carry them.
+_SELF_ADVECTING = (nonlinear_convection, burgers, convection_2d, burgers_2d)
+
+
+def stable_dt(dx, dy=None, speed_x=0.0, speed_y=0.0, nu=0.0, sigma=0.9):
+    """The largest stable time step for upwind convection plus diffusion.
+
+    The updates of Steps 1-8 are monotone, so the largest |u| can only
+    shrink, as long as
+
+        dt (|u| / dx + |v| / dy) + 2 nu dt (1 / dx^2 + 1 / dy^2) <= 1
+
+    for speeds u, v >= 0, as in the notebooks.  Without diffusion this is
+    the CFL condition of 03_CFL_Condition; without convection it is the
+    nu dt / dx^2 <= 1/2 (1-D) or 1/4 (2-D, dx = dy) of Steps 3 and 7.
+    *speed_x* and *speed_y* are the largest speeds, dy is None in 1-D, and
+    the bound is multiplied by the safety factor *sigma*.  When nothing
+    moves and nu is zero every step is stable, and the result is infinite.
+    """
+    rate = speed_x / dx + 2 * nu / dx**2
+    if dy is not None:
+        rate += speed_y / dy + 2 * nu / dy**2
+    with numpy.errstate(divide="ignore"):
+        return sigma / numpy.float64(rate)
+
+
+def advance_to(
+    solver, fields, t_end, dx, dy=None, *, c=None, nu=0.0, sigma=0.9,
+    max_growth=10.0, dtype=None, **options,
+):
+    """Advance *fields* to time *t_end* with *solver*, choosing dt each step.
+
+    *solver* is one of the solvers of Steps 1-8 and *fields* the tuple of
+    arrays it updates, (u,) or (u, v); c, nu and any *options*, such as
+    boundary, are passed on as the solver's arguments of those names.
+    Before every step dt is stable_dt() for the current largest speeds,
+    which are c for linear convection, max |u| and max |v| when the fields
+    are velocities, and zero for pure diffusion; the last step is cut
+    short to land on t_end, and if nothing moves or diffuses the whole
+    interval is one step.  The solver reuses one DoubleBuffer for every
+    step, and the fields hold the result only once t_end is reached; if
+    *dtype* is given, that buffer computes in it whatever the solver.
+    Returns the number of steps taken.
+
+    Raises FloatingPointError if a field stops being finite or its largest
+    magnitude grows by more than *max_growth*, which a stable run cannot
+    do; this catches, for instance, a negative velocity that the upwind
+    differences of the notebooks cannot carry.
+    """
+    parameters = inspect.signature(solver).parameters
+    buffers = DoubleBuffer(*fields, dtype=dtype)
+    buffers.held = True
+    arguments = dict(zip(("u", "v"), fields), c=c, nu=nu, dx=dx, dy=dy, nt=1)
+    arguments = {k: v for k, v in arguments.items() if k in parameters}
+    arguments.update(options, buffers=buffers)
+
+    def largest(f):
+        return max(f.max(), -f.min())
+
+    # The largest magnitudes after each step are the next step's speeds.
+    sizes = [largest(f) for f in buffers.current]
+    limit = max_growth * max(sizes) or numpy.inf
+    t = 0.0
+    steps = 0
+    try:
+        while t < t_end:
+            if c is not None:
+                speeds = (abs(c), abs(c))
+            elif solver in _SELF_ADVECTING:
+                speeds = (sizes[0], sizes[-1])
+            else:
+                speeds = (0.0, 0.0)
+            dt = stable_dt(dx, dy, *speeds, nu=nu, sigma=sigma)
+            if t + dt >= t_end:
+                dt, t = t_end - t, t_end
+            else:
+                t += dt
+            solver(dt=dt, **arguments)
+            steps += 1
+            sizes = [largest(f) for f in buffers.current]
+            if not numpy.isfinite(max(sizes)) or max(sizes) > limit:
+                raise FloatingPointError(
+                    f"{solver.__name__} blew up at t = {t:.4g} after {steps} steps"
+                )
+    finally:
+        buffers.held = False
+        buffers.finish()
+    return steps
+
+
+# ---------------------------------------------------------------------------
+# Steps 9-10: Laplace and Poisson
+# ---------------------------------------------------------------------------
+
+def _jacobi_weights(dx, dy):
+    """(wx, wy, wb) for the Jacobi update of p_xx + p_yy = b.
+
+    p = ((p_E + p_W) dy^2 + (p_N + p_S) dx^2 - b dx^2 dy^2) / (2 (dx^2 + dy^2))
+      = wx (p_E + p_W) + wy (p_N + p_S) - wb b
+    """
+    denominator = 2 * (dx**2 + dy**2)
+    return dy**2 / denominator, dx**2 / denominator, dx**2 * dy**2 / denominator
+
+
+def _jacobi_sweep(p, pn, source, weights, segments, scratches):
+    """One Jacobi sweep from pn into p over the columns in *segments*.
+
+    *source* is wb b, computed once for all the sweeps with the same b,
+    or None for Laplace's equation.
+    """
+    wx, wy, _ = weights
+    for (cols, west, east), scratch in zip(segments, scratches):
+        out = p[1:-1, cols]
+        numpy.add(pn[1:-1, east], pn[1:-1, west], out=out)
+        out *= wx
+        numpy.add(pn[2:, cols], pn[:-2, cols], out=scratch)
+        scratch *= wy
+        out += scratch
+        if source is not None:
+            out -= source[1:-1, cols]
+
+
+def _scratches(p, segments):
+    return [numpy.empty_like(p[1:-1, cols]) for cols, _, _ in segments]
+
+
+def laplace2d(p, y, dx, dy, l1norm_target, dtype=None):
+    """Step 9: relax Laplace's equation until the relative L1 change is small.
+
+    Boundary conditions are those of Step 9: p = 0 at x = 0, p = y at
+    x = 2 and dp/dy = 0 at y = 0 and y = 1.  If *dtype* is given the
+    sweeps are computed in it; the L1 norms are summed in float64.
+    """
+    buffers = DoubleBuffer(p, dtype=dtype)
+    p = buffers.current[0]
+    magnitude = numpy.empty_like(p)
+    weights = _jacobi_weights(dx, dy)
+    segments = _column_segments(False)
+    scratches = _scratches(p, segments)
+    # The L1 norm of each sweep's result is that of the next one's input.
+    total = numpy.abs(p, out=magnitude).sum(dtype=numpy.float64)
+    l1norm = 1
+    while l1norm > l1norm_target:
+        (p,), (pn,) = buffers.swap()
+        _jacobi_sweep(p, pn, None, weights, segments, scratches)
+        p[:, 0] = 0
+        p[:, -1] = y
+        p[0, :] = p[1, :]
+        p[-1, :] = p[-2, :]
+        previous = total
+        total = numpy.abs(p, out=magnitude).sum(dtype=numpy.float64)
+        l1norm = (total - previous) / previous
+    return buffers.finish()[0]
+
+
+def optimal_omega(shape: tuple, dx: float, dy: float) -> float:
+    """Over-relaxation factor for Step 9's boundaries on a grid of *shape*.
+
+    With p fixed in x and copied in y, the slowest Jacobi mode is a half
+    sine across x that is constant in y, whose spectral radius rho gives
+    the optimal SOR factor 2 / (1 + sqrt(1 - rho^2)).
+    """
+    nx = shape[1]
+    dx2, dy2 = dx**2, dy**2
+    rho = (dx2 + dy2 * numpy.cos(numpy.pi / (nx - 1))) / (dx2 + dy2)
+    return 2 / (1 + numpy.sqrt(1 - rho**2))
+
+
+def _red_black_groups(shape):
+    """The interior of a (ny, nx) grid as four strided blocks, red first.
+
+    Each block is (rows, cols, north, south, east, west), where the last
+    four are the rows and columns holding the neighbours of every point.
+    """
+    ny, nx = shape
+    groups = []
+    for j0, i0 in ((1, 1), (2, 2), (1, 2), (2, 1)):
+        rows, cols = slice(j0, ny - 1, 2), slice(i0, nx - 1, 2)
+        groups.append((
+            rows,
+            cols,
+            slice(j0 + 1, ny, 2),
+            slice(j0 - 1, ny - 2, 2),
+            slice(i0 + 1, nx, 2),
+            slice(i0 - 1, nx - 2, 2),
+        ))
+    return groups
+
+
+def laplace2d_sor(p, y, dx, dy, l1norm_target, omega=None, check_every=10):
+    """Step 9 by red-black successive over-relaxation; returns (p, sweeps).
+
+    Each sweep updates the red points (j + i even) in place and then the
+    black ones, which already see the new red values, over-relaxing every
+    update by *omega* (optimal_omega() if None).  Every *check_every*
+    sweeps the L1 norm of the change one Jacobi sweep would make is
+    compared with l1norm_target times the L1 norm of p, so the tolerance
+    means what it does in laplace2d() but is checked far less often.
+    """
+    if omega is None:
+        omega = optimal_omega(p.shape, dx, dy)
+    # p = (ratio (p_E + p_W) + p_N + p_S) * weight, with no temporaries.
+    ratio = dy**2 / dx**2
+    weight = dx**2 / (2 * (dx**2 + dy**2))
+    blocks = [
+        (group, numpy.empty_like(p[group[0], group[1]]))
+        for group in _red_black_groups(p.shape)
+    ]
+    change = numpy.empty_like(p[1:-1, 1:-1])
+    magnitude = numpy.empty_like(p)
+
+    p[:, 0] = 0
+    p[:, -1] = y
+    sweeps = 0
+    while True:
+        for colour in (blocks[:2], blocks[2:]):
+            for (rows, cols, north, south, east, west), scratch in colour:
+                out = p[rows, cols]
+                numpy.add(p[rows, east], p[rows, west], out=scratch)
+                scratch *= ratio
+                scratch += p[north, cols]
+                scratch += p[south, cols]
+                scratch *= omega * weight
+                out *= 1 - omega
+                out += scratch
+            p[0, :] = p[1, :]
+            p[-1, :] = p[-2, :]
+        sweeps += 1
+        if sweeps % check_every:
+            continue
+        if _converged(p, l1norm_target, ratio, weight, change, magnitude):
+            return p, sweeps
+
+
+def _converged(p, l1norm_target, ratio, weight, change, magnitude) -> bool:
+    """Would one Jacobi sweep change p by at most l1norm_target, in L1?"""
+    numpy.add(p[1:-1, 2:], p[1:-1, :-2], out=change)
+    change *= ratio
+    change += p[2:, 1:-1]
+    change += p[:-2, 1:-1]
+    change *= weight
+    change -= p[1:-1, 1:-1]
+    numpy.abs(change, out=change)
+    numpy.abs(p, out=magnitude)
+    total = magnitude.sum(dtype=numpy.float64)
+    return change.sum(dtype=numpy.float64) <= l1norm_target * total
+
+
+def laplace2d_solve(p, y, dx, dy, l1norm_target, solver):
+    """Step 9 with a Poisson solver; returns (p, solves).
+
+    *solver* is made once per grid, e.g. spectral.laplace_solver(p.shape,
+    dx, dy), and its solve(p, 0) is repeated until the test of
+    laplace2d_sor() is met, so the two stop at the same l1norm_target.  A
+    direct solver meets it with one solve, whatever the grid.
+    """
+    ratio = dy**2 / dx**2
+    weight = dx**2 / (2 * (dx**2 + dy**2))
+    change = numpy.empty_like(p[1:-1, 1:-1])
+    magnitude = numpy.empty_like(p)
+    b = numpy.zeros_like(p)
+
+    p[:, 0] = 0
+    p[:, -1] = y
+    solves = 0
+    while True:
+        solver.solve(p, b)
+        solves += 1
+        if _converged(p, l1norm_target, ratio, weight, change, magnitude):
+            return p, solves
+
+
+def poisson2d(p, b, dx, dy, nt, solver=None):
+    """Step 10: *nt* Jacobi sweeps of p_xx + p_yy = b with p = 0 on the walls.
+
+    If *solver* is given (e.g. spectral.PoissonSolver(p.shape, dx, dy)),
+    its solve(p, b) is used instead of the sweeps.
+    """
+    if solver is not None:
+        return solver.solve(p, b)
+    buffers = DoubleBuffer(p)
+    weights = _jacobi_weights(dx, dy)
+    source = b * weights[2]
+    segments = _column_segments(False)
+    scratches = _scratches(p, segments)
+    for _ in range(nt):
+        (p,), (pn,) = buffers.swap()
+        _jacobi_sweep(p, pn, source, weights, segments, scratches)
+        _set_walls(p, 0)
+    return buffers.finish()[0]
+
+
+# ---------------------------------------------------------------------------
+# Steps 11-12: Navier–Stokes
+# ---------------------------------------------------------------------------
+
+class _FlowKernels:
+    """Coefficients and scratch arrays for the updates of Steps 11 and 12.
+
+    Everything that depends only on the grid, the time step and the fluid
+    is computed once here, so that pressure_source(), momentum() and
+    relax_pressure() evaluate the notebooks' expressions as chains of
+    NumPy calls with `out=`, without creating a temporary array.
+    """
+
+    def __init__(self, grid, dt, dx, dy, rho, nu, periodic_x):
+        """*grid* is any array with the shape of the fields."""
+        self.segments = _column_segments(periodic_x)
+        self.scratches = [
+            [numpy.empty_like(grid[1:-1, cols]) for _ in range(4)]
+            for cols, _, _ in self.segments
+        ]
+        self.rho = rho
+        self.rho_dt = rho / dt
+        self.half_dx, self.half_dy = 1 / (2 * dx), 1 / (2 * dy)
+        self.dt_dx, self.dt_dy = dt / dx, dt / dy
+        self.nu_dx2, self.nu_dy2 = nu * dt / dx**2, nu * dt / dy**2
+        self.grad_x, self.grad_y = dt / (2 * rho * dx), dt / (2 * rho * dy)
+        self.dt = dt
+        self.weights = _jacobi_weights(dx, dy)
+        self.source = numpy.zeros_like(grid)
+
+    def pressure_source(self, b, u, v):
+        """b = rho (div / dt - u_x^2 - 2 u_y v_x - v_y^2), as in build_up_b()."""
+        for (cols, west, east), (dudx, dudy, dvdx, dvdy) in zip(
+            self.segments, self.scratches
+        ):
+            out = b[1:-1, cols]
+            numpy.subtract(u[1:-1, east], u[1:-1, west], out=dudx)
+            dudx *= self.half_dx
+            numpy.subtract(u[2:, cols], u[:-2, cols], out=dudy)
+            dudy *= self.half_dy
+            numpy.subtract(v[1:-1, east], v[1:-1, west], out=dvdx)
+            dvdx *= self.half_dx
+            numpy.subtract(v[2:, cols], v[:-2, cols], out=dvdy)
+            dvdy *= self.half_dy
+            numpy.add(dudx, dvdy, out=out)
+            out *= self.rho_dt
+            dudx *= dudx
+            dvdy *= dvdy
+            dudx += dvdy
+            dudy *= dvdx
+            dudy *= 2
+            dudx += dudy
+            dudx *= self.rho
+            out -= dudx
+        return b
+
+    def relax_pressure(self, buffers, b, nit, set_boundaries):
+        """*nit* Jacobi sweeps on the pressure held by *buffers*."""
+        numpy.multiply(b, self.weights[2], out=self.source)
+        scratches = [scratch[0] for scratch in self.scratches]
+        return _relax_pressure(
+            buffers, self.source, self.weights, nit, self.segments, scratches,
+            set_boundaries,
+        )
+
+    def momentum(self, u, v, un, vn, p, force=0.0, norms=False):
+        """Advance u and v one step from un and vn given the pressure p.
+
+        If *norms*, returns the root-mean-square and the largest magnitude
+        of u - un over the updated points, each segment measured in the
+        scratch array as soon as it is written and summed in float64.
+        """
+        squares, largest, points = 0.0, 0.0, 0
+        for (cols, west, east), (scratch, *_) in zip(self.segments, self.scratches):
+            uc, vc = un[1:-1, cols], vn[1:-1, cols]
+            for f, fn in ((u, un), (v, vn)):
+                out, fc = f[1:-1, cols], fn[1:-1, cols]
+                west_f, south_f = fn[1:-1, west], fn[:-2, cols]
+                _subtract_upwind(out, fc, west_f, uc, self.dt_dx, scratch, first=True)
+                _subtract_upwind(out, fc, south_f, vc, self.dt_dy, scratch)
+                east_f, north_f = fn[1:-1, east], fn[2:, cols]
+                _add_second_difference(out, west_f, fc, east_f, self.nu_dx2, scratch)
+                _add_second_difference(out, south_f, fc, north_f, self.nu_dy2, scratch)
+            out = u[1:-1, cols]
+            numpy.subtract(p[1:-1, east], p[1:-1, west], out=scratch)
+            scratch *= self.grad_x
+            out -= scratch
+            if force:
+                out += force * self.dt
+            if norms:
+                numpy.subtract(out, uc, out=scratch)
+                numpy.abs(scratch, out=scratch)
+                largest = max(largest, scratch.max())
+                scratch *= scratch
+                squares += scratch.sum(dtype=numpy.float64)
+                points += scratch.size
+            out = v[1:-1, cols]
+            numpy.subtract(p[2:, cols], p[:-2, cols], out=scratch)
+            scratch *= self.grad_y
+            out -= scratch
+        if norms:
+            return numpy.sqrt(squares / points), largest
+
+
+def build_up_b(b, rho, dt, u, v, dx, dy, periodic_x=False):
+    """Fill b with the source term of the pressure-Poisson equation.
+
+    This is the bracketed expression of Step 11 times rho, evaluated on
+    the interior, or on every column if *periodic_x* (Step 12).
+    """
+    kernels = _FlowKernels(b, dt, dx, dy, rho, 0.0, periodic_x)
+    return kernels.pressure_source(b, u, v)
+
+
+def _relax_pressure(buffers, source, weights, nit, segments, scratches, set_boundaries):
+    """*nit* Jacobi sweeps on the field held by *buffers*, a DoubleBuffer."""
+    for _ in range(nit):
+        (p,), (pn,) = buffers.swap()
+        _jacobi_sweep(p, pn, source, weights, segments, scratches)
+        set_boundaries(p)
+    return buffers.finish()[0]
+
+
+def _cavity_pressure_boundaries(p):
+    p[:, -1] = p[:, -2]
+    p[0, :] = p[1, :]
+    p[:, 0] = p[:, 1]
+    p[-1, :] = 0
+
+
+def _channel_pressure_boundaries(p):
+    p[-1, :] = p[-2, :]
+    p[0, :] = p[1, :]
+
+
+def pressure_poisson(p, dx, dy, b, nit=50):
+    """Step 11: *nit* Jacobi sweeps of the pressure-Poisson equation.
+
+    dp/dx = 0 at x = 0 and 2, dp/dy = 0 at y = 0 and p = 0 at y = 2.
+    """
+    weights = _jacobi_weights(dx, dy)
+    segments = _column_segments(False)
+    return _relax_pressure(
+        DoubleBuffer(p), b * weights[2], weights, nit, segments,
+        _scratches(p, segments), _cavity_pressure_boundaries,
+    )
+
+
+def pressure_poisson_periodic(p, dx, dy, b, nit=50):
+    """Step 12: *nit* Jacobi sweeps, periodic in x, dp/dy = 0 at y = 0 and 2."""
+    weights = _jacobi_weights(dx, dy)
+    segments = _column_segments(True)
+    return _relax_pressure(
+        DoubleBuffer(p), b * weights[2], weights, nit, segments,
+        _scratches(p, segments), _channel_pressure_boundaries,
+    )
+
+
+def cavity_flow(
+    nt, u, v, dt, dx, dy, p, rho, nu, nit=50, pressure_solver=None, recorder=None,
+    dtype=None,
+):
+    """Step 11: lid-driven cavity flow for *nt* steps.
+
+    The lid at y = 2 moves with u = 1; u = v = 0 on the other walls.
+    Each step solves for pressure with *nit* Jacobi sweeps, or with
+    `pressure_solver.solve(p, b)` if a solver such as
+    multigrid.cavity_solver(p.shape, dx, dy) is given.  A *recorder*, such
+    as a snapshots.Writer, is given the fields before the first step and
+    after every step.  If *dtype* is given u, v and the Jacobi sweeps are
+    computed in it, and p is converted back after each step's sweeps.
+    """
+    velocity = DoubleBuffer(u, v, dtype=dtype)
+    b = numpy.zeros_like(p, dtype=dtype)
+    kernels = _FlowKernels(b, dt, dx, dy, rho, nu, periodic_x=False)
+    if pressure_solver is None:
+        pressure = DoubleBuffer(p, dtype=dtype)
+    if recorder is not None:
+        recorder.record(0, 0.0, u=u, v=v, p=p)
+    for step in range(1, nt + 1):
+        (u, v), (un, vn) = velocity.swap()
+        kernels.pressure_source(b, un, vn)
+        if pressure_solver is None:
+            kernels.relax_pressure(pressure, b, nit, _cavity_pressure_boundaries)
+        else:
+            pressure_solver.solve(p, b)
+        kernels.momentum(u, v, un, vn, p)
+        _set_walls(u, 0)
+        u[-1, :] = 1
+        _set_walls(v, 0)
+        if recorder is not None:
+            recorder.record(step, step * dt, u=u, v=v, p=p)
+    u, v = velocity.finish()
+    return u, v, p
+
+
+class SteadyState:
+    """Convergence monitor for channel_flow, in place of Step 12's test.
+
+    Usage:
+        monitor = ns.SteadyState(tol=1e-4, every=10)
+        u, v, p, steps = ns.channel_flow(u, v, p, ..., monitor=monitor)
+        monitor.history     # [(step, rms, largest), ...]
+
+    Step 12 stops when the sum of u changes by less than a fraction of
+    itself, which needs a sum over the grid every step and can stop far
+    from the steady state: on the notebook's grid it stops at max u = 3.5
+    while the flow settles at 5, and changes of opposite sign cancel in
+    the sum.  This monitor instead measures the change u - un itself,
+    while momentum() writes u, and only every *every* steps.  The run
+    stops at the first check where the largest change per unit time,
+    max |u - un| / dt, is at most *tol*.  Each check appends the step
+    number and the root-mean-square and largest |u - un| to *history*,
+    and raises FloatingPointError if the change is not finite.  A change
+    smaller than the spacing of the numbers near max |u| cannot be seen,
+    so in float32 *tol* must stay well above 1e-7 max |u| / dt.
+    """
+
+    def __init__(self, tol=1e-4, every=10):
+        if every < 1:
+            raise ValueError(f"every must be at least 1, not {every}")
+        self.tol = tol
+        self.every = every
+        self.history = []
+
+    def due(self, step: int) -> bool:
+        """Whether *step* (counted from 1) is a checking step."""
+        return step % self.every == 0
+
+    def converged(self, step: int, rms: float, largest: float, dt: float) -> bool:
+        """Record the norms of the change made by *step*; True if steady."""
+        self.history.append((step, float(rms), float(largest)))
+        if not numpy.isfinite(largest):
+            raise FloatingPointError(f"the flow blew up by step {step}")
+        return largest <= self.tol * dt
+
+
+def channel_flow(
+    u, v, p, dt, dx, dy, rho, nu, F, nit=50, tol=0.001, max_steps=None,
+    pressure_solver=None, monitor=None, recorder=None, dtype=None,
+):
+    """Step 12: channel flow driven by a body force F, periodic in x.
+
+    Steps until the relative change in the sum of u drops to *tol* (the
+    criterion of Step 12), or *max_steps* steps have been taken, and
+    returns (u, v, p, number of steps).  u = v = 0 on the walls at y = 0
+    and y = 2.  As in cavity_flow, *pressure_solver* (for instance
+    multigrid.channel_solver(p.shape, dx, dy)) replaces the *nit* Jacobi
+    sweeps per step.  If a SteadyState *monitor* is given, its test
+    replaces Step 12's and *tol* is ignored.  A *recorder* and *dtype* are
+    used as in cavity_flow; the sums and norms of the convergence tests
+    are taken in float64.  The number of steps is not known in advance,
+    so give *max_steps* with a recorder and make sure it has room for that
+    many steps: a snapshots.Writer that fills up stops recording.
+    """
+    velocity = DoubleBuffer(u, v, dtype=dtype)
+    b = numpy.zeros_like(p, dtype=dtype)
+    kernels = _FlowKernels(b, dt, dx, dy, rho, nu, periodic_x=True)
+    if pressure_solver is None:
+        pressure = DoubleBuffer(p, dtype=dtype)
+    if monitor is None:
+        total = u.sum(dtype=numpy.float64)
+    if recorder is not None:
+        recorder.record(0, 0.0, u=u, v=v, p=p)
+    steady = False
+    stepcount = 0
+    while not steady and (max_steps is None or stepcount < max_steps):
+        (u, v), (un, vn) = velocity.swap()
+        kernels.pressure_source(b, un, vn)
+        if pressure_solver is None:
+            kernels.relax_pressure(pressure, b, nit, _channel_pressure_boundaries)
+        else:
+            pressure_solver.solve(p, b)
+        stepcount += 1
+        check = monitor is not None and monitor.due(stepcount)
+        norms = kernels.momentum(u, v, un, vn, p, force=F, norms=check)
+        u[0, :] = 0
+        u[-1, :] = 0
+        v[0, :] = 0
+        v[-1, :] = 0
+        if monitor is None:
+            previous, total = total, u.sum(dtype=numpy.float64)
+            # Written so that a NaN stops the run, as in Step 12.
+            steady = not (total - previous) / total > tol
+        elif check:
+            steady = monitor.converged(stepcount, *norms, dt)
+        if recorder is not None:
+            recorder.record(stepcount, stepcount * dt, u=u, v=v, p=p)
+    u, v = velocity.finish()
+    return u, v, p, stepcount
+
+
+# ---------------------------------------------------------------------------
+# Precision
+# ---------------------------------------------------------------------------
+
+def precision_report(run, dtype=numpy.float32) -> dict:
+    """Compare run(dtype) with the reference run(numpy.float64).
+
+    *run* sets up a problem in the dtype it is given, for instance with
+    hat(..., dtype=dtype) or a solver's dtype argument, solves it and
+    returns an array or a tuple of results.  The report holds the wall
+    times of the two runs, "seconds" and "reference_seconds"; for each
+    array returned, in order, its largest difference from the reference in
+    "max_error" and that difference over the reference's largest magnitude
+    in "relative_error"; and any other results, such as step counts, as
+    (value, reference) pairs in "other".
+    """
+    runs = []
+    for kind in (dtype, numpy.float64):
+        start = time.perf_counter()
+        result = run(kind)
+        seconds = time.perf_counter() - start
+        runs.append((result if isinstance(result, tuple) else (result,), seconds))
+    (values, seconds), (references, reference_seconds) = runs
+    report = {
+        "seconds": seconds,
+        "reference_seconds": reference_seconds,
+        "max_error": [],
+        "relative_error": [],
+        "other": [],
+    }
+    for value, reference in zip(values, references):
+        if isinstance(reference, numpy.ndarray):
+            error = float(numpy.abs(value - reference).max())
+            scale = float(numpy.abs(reference).max())
+            report["max_error"].append(error)
+            if scale:
+                report["relative_error"].append(error / scale)
+            else:
+                report["relative_error"].append(numpy.inf if error else 0.0)
+        else:
+            report["other"].append((value, reference))
+    return report
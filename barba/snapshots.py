@@ -0,0 +1,162 @@
+"""Record every k-th step of a simulation on disk, and read it back lazily.
+
+Usage:
+    import snapshots
+    import navier_stokes as ns
+
+    with snapshots.Writer("cavity", p.shape, frames=101, every=5) as writer:
+        ns.cavity_flow(nt, u, v, dt, dx, dy, p, rho, nu, recorder=writer)
+
+    run = snapshots.read("cavity")
+    run.times, run.steps            # one entry per frame recorded
+    run["u"][k]                     # u at run.times[k], a view of the file
+
+The notebooks keep only the final field, so looking at how a flow
+develops means running it again.  A Writer instead copies the fields of
+every *every*-th step into preallocated .npy files in a directory, one per
+field with shape (frames, ny, nx), memory-mapped so that only the frames
+being written are held in RAM.  index.npy holds the step and time of each
+frame, NaN for frames not yet written.
+
+read() maps the same files read-only and cuts them to the frames written,
+so slicing a frame, or every tenth frame, reads just those pages of the
+file and copies nothing.  The files are ordinary .npy files and can also
+be opened with numpy.load(path, mmap_mode="r").
+
+Given a recorder, cavity_flow and channel_flow call `recorder.record(step,
+time, u=u, v=v, p=p)` with the initial fields (step 0) and after every
+step.  For the solvers of Steps 1-8, call them with nt = every and record
+after each call.
+
+channel_flow runs until the flow is steady, which can take any number of
+steps, so give it max_steps along with a recorder and make frames at least
+max_steps // every + 1.  Without that a Writer may fill up part-way
+through; by default it then stops recording and warns, so the run still
+finishes, while on_full="raise" makes it raise instead.
+"""
+
+import os
+import warnings
+
+import numpy
+from numpy.lib.format import open_memmap
+
+INDEX = "index.npy"
+
+
+class Writer:
+    """Preallocated, memory-mapped .npy files for *frames* snapshots.
+
+    *shape* is the shape of one field and *fields* the names of the
+    fields recorded, each stored in <directory>/<name>.npy.  Existing
+    files of the same names are overwritten.
+
+    *on_full* says what record() does once every frame is used: "warn"
+    (stop recording and warn once), "ignore" (stop recording silently) or
+    "raise" (raise ValueError).  Either way, *full* is then true.
+    """
+
+    def __init__(
+        self, directory, shape, frames, every=1, fields=("u", "v", "p"),
+        dtype=numpy.float64, on_full="warn",
+    ):
+        if every < 1:
+            raise ValueError(f"every must be at least 1, not {every}")
+        if on_full not in ("warn", "ignore", "raise"):
+            raise ValueError(
+                f"on_full must be 'warn', 'ignore' or 'raise', not {on_full!r}"
+            )
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.every = every
+        self.on_full = on_full
+        self.full = False
+        self.count = 0
+        self.frames = {
+            name: open_memmap(
+                os.path.join(directory, f"{name}.npy"), mode="w+",
+                dtype=dtype, shape=(frames, *shape),
+            )
+            for name in fields
+        }
+        self.index = open_memmap(
+            os.path.join(directory, INDEX), mode="w+", dtype=numpy.float64,
+            shape=(frames, 2),
+        )
+        self.index[:] = numpy.nan
+
+    def record(self, step: int, time: float, **fields) -> bool:
+        """Store *fields* if *step* is a multiple of every; True if stored.
+
+        Every field named when the Writer was made must be given.  Once all
+        the frames have been used, nothing more is stored and on_full
+        decides whether to warn or raise.
+        """
+        if step % self.every:
+            return False
+        if self.count == len(self.index):
+            message = (
+                f"all {self.count} frames in {self.directory!r} are used; "
+                f"step {step} and later are not recorded"
+            )
+            if self.on_full == "raise":
+                self.full = True
+                raise ValueError(message)
+            if self.on_full == "warn" and not self.full:
+                warnings.warn(message, RuntimeWarning, stacklevel=2)
+            self.full = True
+            return False
+        for name, frames in self.frames.items():
+            frames[self.count] = fields[name]
+        self.index[self.count] = step, time
+        self.count += 1
+        return True
+
+    def flush(self) -> None:
+        """Write the frames recorded so far to disk."""
+        for frames in self.frames.values():
+            frames.flush()
+        self.index.flush()
+
+    def close(self) -> None:
+        """Flush and release the files."""
+        self.flush()
+        self.frames = {}
+        self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Run:
+    """The frames of a recorded run, as returned by read()."""
+
+    def __init__(self, directory, fields, index):
+        self.directory = directory
+        self.fields = fields
+        self.steps = index[:, 0].astype(int)
+        self.times = index[:, 1]
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        """The (frames, ny, nx) array of field *name*."""
+        return self.fields[name]
+
+
+def read(directory) -> Run:
+    """Map the files written by a Writer in *directory* read-only."""
+    index = numpy.load(os.path.join(directory, INDEX))
+    unused = numpy.flatnonzero(numpy.isnan(index[:, 0]))
+    count = unused[0] if len(unused) else len(index)
+    fields = {}
+    for entry in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(entry)
+        if extension == ".npy" and entry != INDEX:
+            path = os.path.join(directory, entry)
+            fields[name] = numpy.load(path, mmap_mode="r")[:count]
+    return Run(directory, fields, index[:count])
@@ -0,0 +1,212 @@
+"""Direct Fourier-transform Poisson solvers for Steps 9, 10 and 12.
+
+Usage:
+    import spectral
+    import navier_stokes as ns
+
+    solver = spectral.PoissonSolver(p.shape, dx, dy)   # p fixed on the walls
+    solver.solve(p, b)                                 # p updated in place
+    ns.poisson2d(p, b, dx, dy, nt, solver=solver)      # Step 10, no iterations
+
+    laplace = spectral.laplace_solver(p.shape, dx, dy)  # Step 9
+    p, solves = ns.laplace2d_solve(p, y, dx, dy, l1norm_target, laplace)
+
+    channel = spectral.channel_solver(p.shape, dx, dy)  # Step 12
+    ns.channel_flow(u, v, p, dt, dx, dy, rho, nu, F, pressure_solver=channel)
+
+On a rectangle with the same kind of boundary at both ends of each axis,
+the discrete Laplacian of the notebooks is diagonalized by a transform
+along each axis:
+
+- "dirichlet": a sine transform (DST-I); the boundary rows and columns of
+  p keep their values, which are moved to the right-hand side
+- "neumann":   a cosine transform (DCT-II), for the notebooks' rule that
+  copies the row or column next to the boundary onto it
+- "periodic":  the discrete Fourier transform; every column is unknown
+  and the last neighbours the first
+
+so the equations can be solved exactly, in O(N log N), by transforming b,
+dividing by the eigenvalues and transforming back.  Steps 10 (Dirichlet),
+9 (Dirichlet in x, Neumann in y) and 12 (periodic in x, Neumann in y) all
+fit; Step 11, with Neumann and Dirichlet sides on the same axis, does not,
+and multigrid.cavity_solver handles it instead.
+
+NumPy has no sine or cosine transforms, so they are computed with
+numpy.fft on an odd or even extension of the data.  The eigenvalues and
+the cosine transform's twiddle factors depend only on the grid and are
+cached per size, so every solver for a given grid shares them.  When no
+side is Dirichlet the pressure is fixed only up to a constant: the mean of
+b is then removed and the mean of p left unchanged, as in multigrid.py.
+"""
+
+import functools
+
+import numpy
+from multigrid import DIRICHLET, NEUMANN, PERIODIC
+
+# ---------------------------------------------------------------------------
+# Transforms along the last axis
+# ---------------------------------------------------------------------------
+
+def dst(x: numpy.ndarray) -> numpy.ndarray:
+    """DST-I: y[k] = sum_j x[j] sin(pi (j + 1) (k + 1) / (m + 1))."""
+    m = x.shape[-1]
+    extended = numpy.zeros(x.shape[:-1] + (2 * (m + 1),))
+    extended[..., 1 : m + 1] = x
+    extended[..., m + 2 :] = -x[..., ::-1]
+    return numpy.fft.rfft(extended)[..., 1 : m + 1].imag / -2
+
+
+def idst(y: numpy.ndarray) -> numpy.ndarray:
+    """Inverse of dst()."""
+    return dst(y) * (2 / (y.shape[-1] + 1))
+
+
+@functools.cache
+def _twiddle(m: int) -> numpy.ndarray:
+    twiddle = numpy.exp(-1j * numpy.pi * numpy.arange(m) / (2 * m))
+    twiddle.flags.writeable = False
+    return twiddle
+
+
+def dct(x: numpy.ndarray) -> numpy.ndarray:
+    """DCT-II: y[k] = sum_j x[j] cos(pi k (2 j + 1) / (2 m))."""
+    m = x.shape[-1]
+    extended = numpy.concatenate((x, x[..., ::-1]), axis=-1)
+    return (numpy.fft.rfft(extended)[..., :m] * _twiddle(m)).real / 2
+
+
+def idct(y: numpy.ndarray) -> numpy.ndarray:
+    """Inverse of dct()."""
+    m = y.shape[-1]
+    z = numpy.zeros(y.shape[:-1] + (m + 1,), dtype=complex)
+    numpy.multiply(y, _twiddle(m).conj(), out=z[..., :m])
+    z *= 2
+    return numpy.fft.irfft(z, n=2 * m)[..., :m]
+
+
+_REAL_TRANSFORMS = {DIRICHLET: (dst, idst), NEUMANN: (dct, idct)}
+
+
+@functools.cache
+def eigenvalues(m: int, h: float, bc: str) -> numpy.ndarray:
+    """Eigenvalues of the 1-D second difference on *m* unknowns, in the
+    order of the transform for boundary condition *bc*."""
+    if bc == DIRICHLET:
+        angles = numpy.pi * numpy.arange(1, m + 1) / (m + 1)
+    elif bc == NEUMANN:
+        angles = numpy.pi * numpy.arange(m) / m
+    else:
+        angles = 2 * numpy.pi * numpy.arange(m) / m
+    values = (2 * numpy.cos(angles) - 2) / h**2
+    values.flags.writeable = False
+    return values
+
+
+# ---------------------------------------------------------------------------
+# Solver
+# ---------------------------------------------------------------------------
+
+class PoissonSolver:
+    """Exact solutions of p_xx + p_yy = b on a fixed grid.
+
+    *shape* is the shape of p, boundary rows and columns included, and *x*
+    and *y* are each "dirichlet", "neumann" or "periodic" (see the module
+    docstring).  solve() has the same interface as
+    multigrid.PoissonSolver.solve(), so either can be passed to
+    navier_stokes as a pressure solver.
+    """
+
+    def __init__(self, shape: tuple, dx: float, dy: float, x=DIRICHLET, y=DIRICHLET):
+        for bc in (x, y):
+            if bc not in (DIRICHLET, NEUMANN, PERIODIC):
+                raise ValueError(
+                    f"spectral solvers need the same boundary condition at both "
+                    f"ends of an axis, not {bc!r}; use multigrid.PoissonSolver"
+                )
+        self.x, self.y = x, y
+        self.dx, self.dy = dx, dy
+        self.rows = slice(None) if y == PERIODIC else slice(1, -1)
+        self.cols = slice(None) if x == PERIODIC else slice(1, -1)
+        self.singular = DIRICHLET not in (x, y)
+        ny, nx = shape
+        self.shape = (
+            ny if y == PERIODIC else ny - 2,
+            nx if x == PERIODIC else nx - 2,
+        )
+        my, mx = self.shape
+        lam_y, lam_x = eigenvalues(my, dy, y), eigenvalues(mx, dx, x)
+        # numpy.fft.rfft keeps only the non-negative frequencies of the last
+        # axis transformed, which is the periodic axis if there is one.
+        if x == PERIODIC:
+            lam_x = lam_x[: mx // 2 + 1]
+        elif y == PERIODIC:
+            lam_y = lam_y[: my // 2 + 1]
+        lam = lam_y[:, None] + lam_x[None, :]
+        if self.singular:
+            lam[0, 0] = numpy.inf  # the constant mode, set separately
+        self._inverse_eigenvalues = 1 / lam
+
+    def solve(self, p: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+        """Solve p_xx + p_yy = b in place; p's boundary values are used."""
+        f = b[self.rows, self.cols].copy()
+        if self.x == DIRICHLET:
+            f[:, 0] -= p[self.rows, 0] / self.dx**2
+            f[:, -1] -= p[self.rows, -1] / self.dx**2
+        if self.y == DIRICHLET:
+            f[0, :] -= p[0, self.cols] / self.dy**2
+            f[-1, :] -= p[-1, self.cols] / self.dy**2
+        if self.singular:
+            mean = p[self.rows, self.cols].mean()
+
+        coefs = self._forward(f)
+        coefs *= self._inverse_eigenvalues
+        interior = self._inverse(coefs)
+
+        if self.singular:
+            interior += mean
+        p[self.rows, self.cols] = interior
+        # In the notebooks' order: columns first, then rows.
+        if self.x == NEUMANN:
+            p[:, 0] = p[:, 1]
+            p[:, -1] = p[:, -2]
+        if self.y == NEUMANN:
+            p[0, :] = p[1, :]
+            p[-1, :] = p[-2, :]
+        return p
+
+    def _forward(self, f):
+        if self.x == PERIODIC and self.y == PERIODIC:
+            return numpy.fft.rfft2(f)
+        if self.x == PERIODIC:
+            return numpy.fft.rfft(_REAL_TRANSFORMS[self.y][0](f.T).T, axis=1)
+        f = _REAL_TRANSFORMS[self.x][0](f)
+        if self.y == PERIODIC:
+            return numpy.fft.rfft(f.T, axis=1).T
+        return _REAL_TRANSFORMS[self.y][0](f.T).T
+
+    def _inverse(self, coefs):
+        my, mx = self.shape
+        if self.x == PERIODIC and self.y == PERIODIC:
+            return numpy.fft.irfft2(coefs, s=self.shape)
+        if self.x == PERIODIC:
+            return _REAL_TRANSFORMS[self.y][1](numpy.fft.irfft(coefs, n=mx).T).T
+        if self.y == PERIODIC:
+            coefs = numpy.fft.irfft(coefs.T, n=my).T
+        else:
+            coefs = _REAL_TRANSFORMS[self.y][1](coefs.T).T
+        return _REAL_TRANSFORMS[self.x][1](coefs)
+
+
+# ---------------------------------------------------------------------------
+# The boundary conditions of the notebooks
+# ---------------------------------------------------------------------------
+
+def laplace_solver(shape: tuple, dx: float, dy: float) -> PoissonSolver:
+    """Step 9: p fixed at x = 0 and 2, dp/dy = 0 at y = 0 and 1."""
+    return PoissonSolver(shape, dx, dy, x=DIRICHLET, y=NEUMANN)
+
+
+def channel_solver(shape: tuple, dx: float, dy: float) -> PoissonSolver:
+    """Step 12: periodic in x, dp/dy = 0 at y = 0 and 2."""
+    return PoissonSolver(shape, dx, dy, x=PERIODIC, y=NEUMANN)
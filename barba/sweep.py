@@ -0,0 +1,133 @@
+"""Run the solvers of Steps 3, 4 and 7 over a grid of parameters.
+
+Usage:
+    import sweep
+
+    runs = sweep.sweep("diffusion", nu=[0.1, 0.2, 0.3], sigma=[0.1, 0.2], nx=[41, 81])
+    runs.select("nx", "nu", "sigma", "seconds")
+
+Each keyword gives a parameter one value or a list of values, and every
+combination is run; parameters that are not given keep the values used in
+the notebooks (see PROBLEMS).  The problems are:
+
+- "diffusion": Step 3, ns.diffusion of the hat function, dt = sigma dx^2 / nu
+- "burgers":   Step 4, ns.burgers of the sawtooth, dt = nu dx
+- "diffuse":   Step 7, ns.diffuse of the 2-D hat function, dt = sigma dx dy / nu
+
+Runs with the same grid and number of steps form a batch and are advanced
+together: their fields are stacked along a batch axis, nu and dt become
+arrays along that axis, and the solver is called once, so every NumPy call
+in a step updates all the runs of the batch.  The batch axis is the last
+one rather than the first, because the solvers index space from the front
+(u[1:-1], u[1:-1, 1:-1]) and so work on the stack unchanged.  If the grid
+of parameters needs more than one batch, the batches are run in a process
+pool.
+
+The result is a polars DataFrame with one row per run, in the order of
+the combinations: the parameters, the final field u (flattened, so reshape
+it to (ny, nx) for Step 7), the batch the run was part of and its size,
+and the run's share of the batch's wall time in seconds.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import navier_stokes as ns
+import numpy
+
+PROBLEMS = {
+    "diffusion": {"nx": 41, "nt": 20, "nu": 0.3, "sigma": 0.2},
+    "burgers": {"nx": 101, "nt": 100, "nu": 0.07},
+    "diffuse": {"nx": 31, "ny": 31, "nt": 17, "nu": 0.05, "sigma": 0.25},
+}
+
+# Runs can share a batch only if these are equal.
+BATCH_KEY = ("nx", "ny", "nt")
+
+
+def combinations(problem: str, **grid) -> list[dict]:
+    """Every combination of the values in *grid*, with defaults filled in."""
+    if problem not in PROBLEMS:
+        raise ValueError(f"unknown problem {problem!r}; expected {list(PROBLEMS)}")
+    defaults = PROBLEMS[problem]
+    unknown = sorted(set(grid) - set(defaults))
+    if unknown:
+        raise ValueError(f"{problem!r} has no parameters {unknown}")
+    values = []
+    for name, default in defaults.items():
+        value = grid.get(name, default)
+        values.append(list(value) if numpy.ndim(value) else [value])
+    return [dict(zip(defaults, combo)) for combo in itertools.product(*values)]
+
+
+def batches(runs: list[dict]) -> list[list[int]]:
+    """Group the indices of *runs* into batches that can run together."""
+    groups = {}
+    for index, run in enumerate(runs):
+        key = tuple(run.get(name) for name in BATCH_KEY)
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+
+def run_batch(problem: str, runs: list[dict]) -> tuple[numpy.ndarray, float]:
+    """Advance every run in *runs* at once; return (fields, seconds).
+
+    All runs must have the same BATCH_KEY values.  fields[k] is the final
+    field of runs[k] and seconds the wall time of the whole batch.
+    """
+    first = runs[0]
+    nx, nt, size = first["nx"], first["nt"], len(runs)
+    nu = numpy.array([run["nu"] for run in runs])
+    start = time.perf_counter()
+    if problem == "diffusion":
+        dx = 2 / (nx - 1)
+        sigma = numpy.array([run["sigma"] for run in runs])
+        u = numpy.repeat(ns.hat((nx,), dx)[:, None], size, axis=1)
+        ns.diffusion(u, nu, sigma * dx**2 / nu, dx, nt)
+    elif problem == "burgers":
+        dx = 2 * numpy.pi / (nx - 1)
+        x = numpy.linspace(0, 2 * numpy.pi, nx)
+        u = ns.sawtooth(x[:, None], nu)
+        ns.burgers(u, nu, dx * nu, dx, nt)
+    elif problem == "diffuse":
+        ny = first["ny"]
+        dx, dy = 2 / (nx - 1), 2 / (ny - 1)
+        sigma = numpy.array([run["sigma"] for run in runs])
+        u = numpy.repeat(ns.hat((ny, nx), dx, dy)[..., None], size, axis=2)
+        ns.diffuse(u, nu, sigma * dx * dy / nu, dx, dy, nt)
+    else:
+        raise ValueError(f"unknown problem {problem!r}")
+    return numpy.moveaxis(u, -1, 0), time.perf_counter() - start
+
+
+def sweep(problem: str, workers: int | None = None, **grid):
+    """Run *problem* for every combination in *grid*; return a DataFrame.
+
+    *workers* limits the process pool (default: one per CPU); with one
+    worker, or only one batch, everything runs in this process.
+    """
+    import polars as pl
+
+    runs = combinations(problem, **grid)
+    groups = batches(runs)
+    inputs = [[runs[i] for i in group] for group in groups]
+    workers = min(workers or os.cpu_count() or 1, len(groups))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch, itertools.repeat(problem), inputs))
+    else:
+        results = [run_batch(problem, batch) for batch in inputs]
+
+    rows = [None] * len(runs)
+    for number, (group, (fields, seconds)) in enumerate(zip(groups, results)):
+        for index, field in zip(group, fields):
+            rows[index] = {
+                **runs[index],
+                "u": field.ravel(),
+                "batch": number,
+                "batch_size": len(group),
+                "seconds": seconds / len(group),
+            }
+    return pl.DataFrame(rows)
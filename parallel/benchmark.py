@@ -0,0 +1,351 @@
+"""Benchmark every implementation of the four-stage pipeline on one machine.
+
+Run with:
+    python benchmark.py                                  # the full grid
+    python benchmark.py --backends serial process dagster --n-groups 4 64
+    marimo edit benchmark_report.py                      # explore the results
+
+Each (backend, n_groups, size_scale) case runs in a fresh subprocess so that
+peak memory, imports and scheduler start-up are measured per case rather
+than accumulated across the whole session.  Every backend runs locally:
+
+- serial, thread, process  — parallel.run_pipeline with that executor
+- luigi                    — luigi.build(..., local_scheduler=True)
+- dagster                  — parallel_pipeline_job.execute_in_process()
+- dagster_batched          — the same, with several groups per dynamic branch
+- metaflow                 — `python using_metaflow.py run` (local runtime)
+- metaflow_batched         — the same, with several groups per foreach branch
+
+Each case also gets its own empty result cache (see caching.py), run
+directory (see checkpoint.py) and Metaflow datastore, so no run is sped up
+by results left behind by an earlier one.
+
+For every case the harness records wall time, peak memory and the time the
+backend spent in each stage (generate, process, transform, aggregate).
+Stage times come from the backend's own run: tracing (see tracing.py) is
+enabled in the case process, and the durations of its spans are summed per
+stage over every worker, so a parallel stage can take longer than the wall
+time.  Tracing adds a small cost to every stage call, the same for every
+backend.  Peak memory is the largest total resident set size of the case
+process and all of its descendants, sampled every SAMPLE_INTERVAL seconds
+while the backend runs; pages shared between processes are counted once per
+process, and peaks shorter than the interval can be missed.
+
+The scheduler overhead per task is the wall time minus the summed stage
+time, divided by the number of tasks in the DAG (see n_tasks); it is
+negative when a parallel backend hides more compute than it adds in
+overhead.  Throughput is reported as groups completed per second of wall
+time.
+
+Results are written as CSV (default benchmark_results.csv), one row per case.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import psutil
+import tracing
+
+from parallel import run_pipeline
+
+BACKENDS = (
+    "serial",
+    "thread",
+    "process",
+    "luigi",
+    "dagster",
+    "dagster_batched",
+    "metaflow",
+    "metaflow_batched",
+)
+N_GROUPS = (4, 64, 1000, 10000)
+SIZE_SCALES = (0.01, 1.0)
+SAMPLE_INTERVAL = 0.05
+HERE = Path(__file__).resolve().parent
+
+FIELDS = [
+    "backend",
+    "n_groups",
+    "size_scale",
+    "workers",
+    "status",
+    "wall_s",
+    "groups_per_s",
+    "peak_rss_mb",
+    "stage_generate_s",
+    "stage_process_s",
+    "stage_transform_s",
+    "stage_aggregate_s",
+    "overhead_per_task_ms",
+]
+
+# Span names recorded by each backend, mapped to the stage they belong to.
+STAGE_SPANS = {
+    "generate_params": "stage_generate_s",
+    "process_group": "stage_process_s",
+    "process_groups_batch": "stage_process_s",
+    "transform_stats": "stage_transform_s",
+    "transform_stats_batch": "stage_transform_s",
+    "aggregate_results": "stage_aggregate_s",
+}
+
+
+# ---------------------------------------------------------------------------
+# Running one case (inside the case subprocess)
+# ---------------------------------------------------------------------------
+
+
+def batch_size(backend: str, n_groups: int, workers: int) -> int:
+    """Groups per dynamic branch: one, except for batched backends.
+
+    Batched backends use the same rule as run_pipeline's chunksize, about
+    four batches per worker.
+    """
+    if backend in ("dagster_batched", "metaflow_batched"):
+        return max(1, n_groups // (4 * workers))
+    return 1
+
+
+def n_tasks(backend: str, n_groups: int, workers: int) -> int:
+    """Number of tasks in the DAG that *backend* schedules.
+
+    Each branch carries one group except under the batched backends.  The
+    Metaflow flow fuses Stages 2 and 3 into one step per branch and adds
+    start, join and end; the others have a Stage 2 and a Stage 3 task per
+    branch plus one task each for Stages 1 and 4.
+    """
+    branches = math.ceil(n_groups / batch_size(backend, n_groups, workers))
+    if backend in ("metaflow", "metaflow_batched"):
+        return branches + 3
+    return 2 * branches + 2
+
+
+def run_backend(backend: str, n_groups: int, size_scale: float, workers: int) -> None:
+    """Execute the whole pipeline once with *backend*."""
+    if backend in ("serial", "thread", "process"):
+        run_pipeline(
+            n_groups, executor=backend, max_workers=workers, size_scale=size_scale
+        )
+    elif backend == "luigi":
+        import luigi
+        from using_luigi import AggregateResults
+
+        succeeded = luigi.build(
+            [AggregateResults(n_groups=n_groups, size_scale=size_scale)],
+            workers=workers,
+            local_scheduler=True,
+            log_level="WARNING",
+        )
+        if not succeeded:
+            raise RuntimeError("Luigi run failed")
+    elif backend in ("dagster", "dagster_batched"):
+        from using_dagster import parallel_pipeline_job
+
+        config = {
+            "n_groups": n_groups,
+            "size_scale": size_scale,
+            "batch_size": batch_size(backend, n_groups, workers),
+        }
+        result = parallel_pipeline_job.execute_in_process(
+            run_config={"ops": {"generate_params_op": {"config": config}}}
+        )
+        if not result.success:
+            raise RuntimeError("Dagster run failed")
+    elif backend in ("metaflow", "metaflow_batched"):
+        size = batch_size(backend, n_groups, workers)
+        subprocess.run(
+            [
+                sys.executable,
+                "using_metaflow.py",
+                "--quiet",
+                "run",
+                "--n_groups",
+                str(n_groups),
+                "--size_scale",
+                str(size_scale),
+                "--batch_size",
+                str(size),
+                "--max-workers",
+                str(workers),
+                "--max-num-splits",
+                str(max(math.ceil(n_groups / size), 100)),
+            ],
+            cwd=HERE,
+            check=True,
+            capture_output=True,
+            env={**os.environ, "USERNAME": os.environ.get("USERNAME", "benchmark")},
+        )
+    else:
+        raise ValueError(f"unknown backend {backend!r}")
+
+
+def stage_times(spans: list[dict]) -> dict:
+    """Total seconds spent in each stage, summed over the spans of a run."""
+    totals = dict.fromkeys(STAGE_SPANS.values(), 0.0)
+    for s in spans:
+        if s["name"] in STAGE_SPANS:
+            totals[STAGE_SPANS[s["name"]]] += (s["end_ns"] - s["start_ns"]) / 1e9
+    return totals
+
+
+def tree_rss(process: psutil.Process) -> int:
+    """Total resident set size in bytes of *process* and all its descendants."""
+    total = 0
+    for proc in [process, *process.children(recursive=True)]:
+        try:
+            total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+
+@contextmanager
+def peak_rss(interval: float = SAMPLE_INTERVAL):
+    """Sample tree_rss of this process on a background thread while the block runs.
+
+    Yields a dict whose "peak_rss_mb" holds the largest total seen so far.
+    """
+    process = psutil.Process()
+    peak = {"peak_rss_mb": 0.0}
+    stop = threading.Event()
+
+    def sample() -> None:
+        while True:
+            mb = tree_rss(process) / (1024 * 1024)
+            peak["peak_rss_mb"] = max(peak["peak_rss_mb"], mb)
+            if stop.wait(interval):
+                return
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield peak
+    finally:
+        stop.set()
+        sampler.join()
+
+
+def measure(backend: str, n_groups: int, size_scale: float, workers: int) -> dict:
+    """Run one case with tracing on and return its row of the results table."""
+    with tempfile.TemporaryDirectory(prefix="pipeline_trace_") as trace_dir:
+        tracing.enable(trace_dir)
+        try:
+            with peak_rss() as rss:
+                start = time.perf_counter()
+                run_backend(backend, n_groups, size_scale, workers)
+                wall = time.perf_counter() - start
+        finally:
+            tracing.disable()
+        stages = stage_times(tracing.load_spans(trace_dir))
+    tasks = n_tasks(backend, n_groups, workers)
+    return {
+        "backend": backend,
+        "n_groups": n_groups,
+        "size_scale": size_scale,
+        "workers": workers,
+        "status": "ok",
+        "wall_s": wall,
+        "groups_per_s": n_groups / wall,
+        "peak_rss_mb": rss["peak_rss_mb"],
+        **stages,
+        "overhead_per_task_ms": 1000 * (wall - sum(stages.values())) / tasks,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driving the grid (in the parent process)
+# ---------------------------------------------------------------------------
+
+
+def run_case(
+    backend: str, n_groups: int, size_scale: float, workers: int, timeout: float
+) -> dict:
+    """Run one case in a fresh subprocess and return its row."""
+    row = {
+        "backend": backend,
+        "n_groups": n_groups,
+        "size_scale": size_scale,
+        "workers": workers,
+    }
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp:
+        result_path = Path(tmp) / "result.json"
+        env = {
+            **os.environ,
+            "PIPELINE_CACHE_DIR": str(Path(tmp) / "cache"),
+            "PIPELINE_RUN_DIR": str(Path(tmp) / "runs"),
+            "METAFLOW_DATASTORE_SYSROOT_LOCAL": tmp,
+        }
+        command = [
+            sys.executable,
+            __file__,
+            "--one",
+            backend,
+            str(n_groups),
+            str(size_scale),
+            str(workers),
+            str(result_path),
+        ]
+        try:
+            subprocess.run(
+                command,
+                cwd=HERE,
+                env=env,
+                timeout=timeout,
+                check=True,
+                capture_output=True,
+            )
+        except subprocess.TimeoutExpired:
+            return {**row, "status": "timeout"}
+        except subprocess.CalledProcessError as exc:
+            last_line = (exc.stderr or b"").decode().strip().splitlines()[-1:]
+            return {**row, "status": f"failed: {' '.join(last_line)}"}
+        return json.loads(result_path.read_text())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--n-groups", nargs="+", type=int, default=N_GROUPS)
+    parser.add_argument("--size-scales", nargs="+", type=float, default=SIZE_SCALES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds per case")
+    parser.add_argument("--output", type=Path, default=HERE / "benchmark_results.csv")
+    parser.add_argument("--one", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        backend, n_groups, size_scale, workers, result_path = args.one
+        row = measure(backend, int(n_groups), float(size_scale), int(workers))
+        Path(result_path).write_text(json.dumps(row))
+        return
+
+    with open(args.output, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=FIELDS)
+        writer.writeheader()
+        for size_scale in args.size_scales:
+            for n_groups in args.n_groups:
+                for backend in args.backends:
+                    row = run_case(
+                        backend, n_groups, size_scale, args.workers, args.timeout
+                    )
+                    writer.writerow(row)
+                    fh.flush()
+                    print(
+                        f"{backend:>15}  n_groups={n_groups:<6} size_scale={size_scale:<5} "
+                        f"{row['status']:<8} {row.get('wall_s', float('nan')):8.3f}s"
+                    )
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
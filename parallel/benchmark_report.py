@@ -0,0 +1,183 @@
+import marimo
+
+__generated_with = "0.20.2"
+app = marimo.App(width="medium")
+
+
+@app.cell
+def _():
+    import altair as alt
+    import marimo as mo
+    import polars as pl
+
+    return alt, mo, pl
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        # Pipeline Backend Benchmark
+
+        This notebook reads the table written by `benchmark.py`, which runs
+        the same four-stage pipeline with every backend (serial loop, thread
+        pool, process pool, Luigi, Dagster with and without batching, and
+        Metaflow) over a grid of group counts and sample-size scales, all on
+        the local machine.
+
+        ```
+        python benchmark.py --output benchmark_results.csv
+        ```
+        """
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    results_path = mo.ui.text(value="benchmark_results.csv", label="Results file")
+    results_path
+    return (results_path,)
+
+
+@app.cell
+def _(pl, results_path):
+    results = pl.read_csv(results_path.value)
+    ok = results.filter(pl.col("status") == "ok")
+    results
+    return ok, results
+
+
+@app.cell
+def _(mo, results):
+    failed = results.filter(results["status"] != "ok")
+    mo.md(
+        "Every case completed."
+        if failed.is_empty()
+        else f"**{failed.height} case(s) timed out or failed** and are left out of the charts below."
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Wall time
+
+        Total time for one run, from scheduling to summary, on log-log axes.
+        The gap between a backend and the serial line is what the backend costs
+        (above) or saves (below).
+        """
+    )
+    return
+
+
+@app.cell
+def _(alt, ok):
+    alt.Chart(ok).mark_line(point=True).encode(
+        x=alt.X("n_groups:Q", scale=alt.Scale(type="log"), title="Groups"),
+        y=alt.Y("wall_s:Q", scale=alt.Scale(type="log"), title="Wall time (s)"),
+        color="backend:N",
+        column=alt.Column("size_scale:O", title="Size scale"),
+        tooltip=["backend", "n_groups", "size_scale", "wall_s"],
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Throughput
+
+        Groups completed per second of wall time.  Comparing `dagster` with
+        `dagster_batched` shows what carrying several groups per dynamic
+        branch saves in per-op overhead.
+        """
+    )
+    return
+
+
+@app.cell
+def _(alt, ok):
+    alt.Chart(ok).mark_line(point=True).encode(
+        x=alt.X("n_groups:Q", scale=alt.Scale(type="log"), title="Groups"),
+        y=alt.Y(
+            "groups_per_s:Q", scale=alt.Scale(type="log"), title="Groups per second"
+        ),
+        color="backend:N",
+        column=alt.Column("size_scale:O", title="Size scale"),
+        tooltip=["backend", "n_groups", "size_scale", "groups_per_s"],
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Scheduler overhead per task
+
+        Wall time minus the time the backend spent inside the four stages
+        (summed over all workers, from its tracing spans), divided by
+        the number of tasks in the DAG (`2 * n_groups + 2` for one group per
+        branch; see `benchmark.n_tasks` for the batched backends and
+        Metaflow's fused step).  Negative values mean parallel execution hid
+        more compute than the backend added.
+        """
+    )
+    return
+
+
+@app.cell
+def _(alt, ok):
+    alt.Chart(ok).mark_bar().encode(
+        x=alt.X("backend:N", title=None),
+        y=alt.Y("overhead_per_task_ms:Q", title="Overhead per task (ms)"),
+        color="backend:N",
+        column=alt.Column("n_groups:O", title="Groups"),
+        row=alt.Row("size_scale:O", title="Size scale"),
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Per-stage compute time and peak memory
+
+        Stage times are summed over every worker of the backend's own run, so
+        a parallel stage can exceed the wall time.  Peak memory is the largest
+        sampled total resident set size of the case process and all of its
+        worker processes.
+        """
+    )
+    return
+
+
+@app.cell
+def _(ok):
+    ok.select(
+        "backend",
+        "size_scale",
+        "n_groups",
+        "stage_generate_s",
+        "stage_process_s",
+        "stage_transform_s",
+        "stage_aggregate_s",
+    ).sort("size_scale", "n_groups", "backend")
+    return
+
+
+@app.cell
+def _(ok, pl):
+    ok.pivot(on="backend", index=["size_scale", "n_groups"], values="peak_rss_mb").sort(
+        "size_scale", "n_groups"
+    ).with_columns(pl.exclude("size_scale", "n_groups").round(1))
+    return
+
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,174 @@
+"""Content-addressed, on-disk result cache for the pipeline's stage functions.
+
+Usage:
+    from caching import cached
+    from parallel import process_group
+
+    process_group = cached(process_group)
+    process_group({"group_id": 0, "seed": 0, "size": 100})   # miss: computed
+    process_group({"group_id": 0, "seed": 0, "size": 100})   # hit: read back
+    process_group.cache_info()   # {'hits': 1, 'misses': 1, 'evictions': 0}
+
+Stages 2 and 3 are pure functions of their arguments, so a result can be
+reused whenever the same function sees the same arguments again.  Each call
+is keyed by a SHA-256 digest of the function's name and source code and of
+its arguments serialized as canonical JSON.  Editing the function therefore
+invalidates its entries, but editing a helper it calls does not, so clear
+the cache after changing one of those.
+
+Entries are small JSON files in a single directory that every entry point
+(the marimo notebook, Luigi, Dagster and Metaflow) shares, so a result
+computed by one backend is a hit for any other backend that makes the same
+call.  The notebook and Luigi cache process_group and transform_stats per
+group, while the batched Dagster and Metaflow versions cache
+process_groups_batch and transform_stats_batch per batch; those share
+entries with each other when their batches match, but never with the
+per-group entries.
+
+When the directory grows beyond its size limit the least-recently-used
+entries are deleted; a hit refreshes an entry's modification time, which
+serves as its last-use stamp.
+
+The directory defaults to ~/.cache/parallel-pipeline and its limit to 64 MB;
+set PIPELINE_CACHE_DIR and PIPELINE_CACHE_MAX_BYTES to override them.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "parallel-pipeline"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Disk store with LRU eviction
+# ---------------------------------------------------------------------------
+
+class DiskCache:
+    """A directory of JSON entries with size-bounded LRU eviction.
+
+    Writes go to a temporary file that is renamed into place, so several
+    worker processes can share one directory without seeing partial
+    entries.  The byte total is tracked per process and resynchronized
+    with the directory whenever an eviction pass runs.
+    """
+
+    def __init__(self, root: Path | str | None = None, max_bytes: int | None = None):
+        self.root = Path(root or os.environ.get("PIPELINE_CACHE_DIR", DEFAULT_CACHE_DIR))
+        self.max_bytes = int(
+            max_bytes or os.environ.get("PIPELINE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes = sum(p.stat().st_size for p in self._entries())
+
+    def get(self, key: str):
+        """Return the value stored under *key*, or None if there is none."""
+        path = self.root / f"{key}.json"
+        try:
+            with open(path) as fh:
+                value = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key: str, value) -> None:
+        """Store *value* under *key*, evicting old entries if over budget."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(value, fh)
+        self._total_bytes += os.path.getsize(tmp_path)
+        os.replace(tmp_path, self.root / f"{key}.json")
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete least-recently-used entries until under the size limit."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self._total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _entries(self):
+        return self.root.glob("*.json")
+
+
+# ---------------------------------------------------------------------------
+# Decorator
+# ---------------------------------------------------------------------------
+
+def function_digest(func) -> str:
+    """Return a digest of *func*'s qualified name and source code."""
+    digest = hashlib.sha256()
+    digest.update(f"{func.__module__}.{func.__qualname__}\0".encode())
+    digest.update(inspect.getsource(func).encode())
+    return digest.hexdigest()
+
+
+def cache_key(func_digest: str, args: tuple, kwargs: dict) -> str:
+    """Return a stable key for one call of the function with *func_digest*."""
+    digest = hashlib.sha256(func_digest.encode())
+    digest.update(json.dumps([args, kwargs], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def cached(func=None, *, cache: DiskCache | None = None):
+    """Wrap a pure stage function so its results are reused from disk.
+
+    Arguments and results must be JSON-serializable, as the pipeline's
+    dicts are.  Like functools.lru_cache, the wrapper gains cache_info()
+    and cache_clear(); the counters are per process, while the entries
+    themselves are shared by every process using the same directory.
+    """
+    if func is None:
+        return functools.partial(cached, cache=cache)
+    store = cache or DiskCache()
+    func_digest = function_digest(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = cache_key(func_digest, args, kwargs)
+        result = store.get(key)
+        if result is None:
+            result = func(*args, **kwargs)
+            store.put(key, result)
+        return result
+
+    wrapper.cache = store
+    wrapper.cache_info = store.info
+    wrapper.cache_clear = store.clear
+    return wrapper
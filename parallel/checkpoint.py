@@ -0,0 +1,132 @@
+"""Persistent run directories that let a pipeline run resume where it stopped.
+
+Usage:
+    from checkpoint import RunDirectory
+
+    run = RunDirectory("runs/example")
+    params = {"group_id": 0, "seed": 0, "size": 100}
+    if run.is_complete("process", 0, params):
+        stats = run.load("process", 0)
+    else:
+        stats = process_group(params)
+        run.save("process", 0, params, stats)
+
+A run directory holds each stage's per-group outputs and a manifest,
+manifest.jsonl, with one line per completed (stage, group_id, input hash).
+The input hash is a SHA-256 digest of the stage's input serialized as
+canonical JSON, so a group counts as done only if its output file still
+exists and it was computed from exactly the input it would get now.  When
+a run dies part-way through, or when the parameters of a few groups change,
+re-running against the same directory executes only the missing or stale
+groups.
+
+An output is written (atomically, via rename) before its manifest line is
+appended, so a crash between the two leaves a group looking incomplete,
+never complete-but-missing.  Each manifest line is a single short append,
+which POSIX keeps intact when several worker processes write at once; a
+later line for the same (stage, group_id) supersedes earlier ones.
+
+Unlike caching.py, whose entries are shared by every run and evicted when
+space runs short, a run directory belongs to one run configuration and
+keeps everything until it is deleted.  Its default location is runs/ in the
+current directory; set PIPELINE_RUN_DIR to override it.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+DEFAULT_RUN_DIR = Path("runs")
+
+
+def default_run_dir(name: str) -> Path:
+    """Return the run directory for the entry point called *name*."""
+    return Path(os.environ.get("PIPELINE_RUN_DIR", DEFAULT_RUN_DIR)) / name
+
+
+def input_hash(value) -> str:
+    """Return a stable digest of a JSON-serializable stage input."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class RunDirectory:
+    """Per-group stage outputs plus a manifest of which ones are current.
+
+    The manifest is read lazily and then followed incrementally: a lookup
+    that misses first reads any lines appended since the last read, so a
+    process sees groups completed by other worker processes.
+    """
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / "manifest.jsonl"
+        self._entries = {}
+        self._offset = 0
+
+    def output_path(
+        self, stage: str, group_id: int | None, suffix: str = ".json"
+    ) -> Path:
+        """Where the output of *stage* for *group_id* lives in this run."""
+        name = "output" if group_id is None else f"group_id={group_id}"
+        return self.root / stage / f"{name}{suffix}"
+
+    def is_complete(self, stage: str, group_id: int | None, inputs) -> bool:
+        """True if *stage* has a current output for *group_id* given *inputs*."""
+        key = (stage, group_id)
+        digest = input_hash(inputs)
+        entry = self._entries.get(key)
+        if entry is None or entry["input_hash"] != digest:
+            self._refresh()
+            entry = self._entries.get(key)
+        return (
+            entry is not None
+            and entry["input_hash"] == digest
+            and (self.root / entry["output"]).exists()
+        )
+
+    def record(
+        self, stage: str, group_id: int | None, inputs, output: Path | str
+    ) -> None:
+        """Mark *output* as the current result of *stage* for *group_id*."""
+        entry = {
+            "stage": stage,
+            "group_id": group_id,
+            "input_hash": input_hash(inputs),
+            # Relative, so that a run directory can be moved or copied.
+            "output": os.path.relpath(output, self.root),
+        }
+        with open(self.manifest_path, "a") as fh:
+            fh.write(json.dumps(entry) + "\n")
+        self._entries[stage, group_id] = entry
+
+    def save(self, stage: str, group_id: int | None, inputs, result) -> None:
+        """Write *result* as JSON and record it in the manifest."""
+        path = self.output_path(stage, group_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(result, fh)
+        os.replace(tmp_path, path)
+        self.record(stage, group_id, inputs, path)
+
+    def load(self, stage: str, group_id: int | None):
+        """Read back a result written by save()."""
+        with open(self.output_path(stage, group_id)) as fh:
+            return json.load(fh)
+
+    def _refresh(self) -> None:
+        try:
+            with open(self.manifest_path, "rb") as fh:
+                fh.seek(self._offset)
+                for line in fh:
+                    # Stop at a line another process is still writing.
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = json.loads(line)
+                    self._entries[entry["stage"], entry["group_id"]] = entry
+                    self._offset += len(line)
+        except FileNotFoundError:
+            pass
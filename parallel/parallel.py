@@ -5,10 +5,29 @@ app = marimo.App(width="medium")
 
 # The setup cell runs before all other cells.  Its body is at module level in
 # the file, so anything defined here is available to @app.function cells and
-# is also importable by external scripts (using_metaflow.py, etc.).
+# is also importable by external scripts (using_metaflow.py, etc.).  The stage
+# functions are wrapped with tracing.traced so that every entry point records
+# the same per-stage spans when tracing is enabled (see tracing.py).
 with app.setup:
+    import asyncio
+    import functools
+    import inspect
+    import os
+    import secrets
+    import threading
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from contextlib import contextmanager, suppress
+    from multiprocessing import shared_memory
+
     import numpy as np
+    from checkpoint import RunDirectory
+    from tracing import traced
+
     N_GROUPS = 4
+    # Samples per piece when process_group scans an array: 512 KiB of
+    # float64, small enough to stay in cache while it is summarized.
+    STATS_CHUNK = 65_536
 
 
 @app.cell
@@ -34,39 +53,365 @@ def _(mo):
 
 
 @app.function
-def generate_params(n_groups: int = N_GROUPS) -> list[dict]:
+@traced
+def generate_params(n_groups: int = N_GROUPS, size_scale: float = 1.0) -> list[dict]:
     """Return one parameter dict per group.
 
     Each dict carries the random seed and sample size for that group,
     plus a numeric group_id that also serves as the true mean of the
-    synthetic data generated in Stage 2.
+    synthetic data generated in Stage 2.  *size_scale* multiplies every
+    group's sample size (each group keeps at least one sample).
     """
     return [
-        {"group_id": i, "seed": i * 42, "size": 100 * (i + 1)}
+        {
+            "group_id": i,
+            "seed": i * 42,
+            "size": max(1, round(100 * (i + 1) * size_scale)),
+        }
         for i in range(n_groups)
     ]
 
 
 @app.function
-def process_group(params: dict) -> dict:
+@traced
+def process_group(
+    params: dict,
+    chunk_size: int | None = None,
+    publish: bool = False,
+    block_name: str | None = None,
+) -> dict:
     """Draw *size* samples from N(group_id, 1) and return raw statistics.
 
     This function is stateless and side-effect free, making it safe to
     run in any order, on any worker.
+
+    By default the whole sample is drawn at once and summarized in one
+    scan: summarize_chunks folds it in pieces of STATS_CHUNK samples, each
+    read from memory once.  For groups of at most STATS_CHUNK samples the
+    result is bit-for-bit that of np.mean, np.std, np.min and np.max.
+    Passing *chunk_size* streams the same samples from the generator in
+    chunks instead, so memory use is bounded by the chunk rather than by
+    *size*; the results agree to rounding.
+
+    Passing *publish* draws the samples straight into a new shared-memory
+    block and adds a small "samples" handle to the result, so later stages
+    can read them with attached_samples instead of having them pickled.
+    The block outlives this call (and this process); whoever consumes it
+    last must call release_samples.  Published results must not be cached,
+    since the handle goes stale once the block is released.  *block_name*
+    names the block instead of letting the OS pick, so a caller can release
+    it even if this call's result never comes back.
     """
     rng = np.random.default_rng(params["seed"])
-    data = rng.normal(loc=params["group_id"], scale=1.0, size=params["size"])
+    if chunk_size is not None:
+        if publish:
+            raise ValueError("chunked groups cannot be published to shared memory")
+        chunks = (
+            rng.normal(loc=params["group_id"], scale=1.0, size=n)
+            for n in chunk_sizes(params["size"], chunk_size)
+        )
+        return summary_stats(params["group_id"], summarize_chunks(chunks))
+    if publish:
+        # normal(loc, 1.0) is loc + standard_normal, so this draws the same
+        # samples as the default path without an intermediate copy.
+        block = shared_memory.SharedMemory(
+            name=block_name,
+            create=True,
+            size=max(1, params["size"] * 8),
+            track=False,
+        )
+        data = np.ndarray(params["size"], dtype=np.float64, buffer=block.buf)
+        rng.standard_normal(out=data)
+        data += params["group_id"]
+    else:
+        data = rng.normal(loc=params["group_id"], scale=1.0, size=params["size"])
+    summary = summarize_chunks(
+        data[start : start + STATS_CHUNK] for start in range(0, data.size, STATS_CHUNK)
+    )
+    stats = summary_stats(params["group_id"], summary)
+    if publish:
+        del data
+        block.close()
+        stats["samples"] = {"name": block.name, "count": params["size"]}
+    return stats
+
+
+@app.function
+def summary_stats(group_id: int, summary: dict) -> dict:
+    """Turn a summary from summarize_chunks into a Stage 2 record."""
     return {
-        "group_id": params["group_id"],
-        "mean": float(np.mean(data)),
-        "std": float(np.std(data)),
-        "min": float(np.min(data)),
-        "max": float(np.max(data)),
-        "count": int(len(data)),
+        "group_id": group_id,
+        "mean": summary["mean"],
+        "std": float(np.sqrt(summary["m2"] / summary["count"])),
+        "min": summary["min"],
+        "max": summary["max"],
+        "count": summary["count"],
     }
 
 
 @app.function
+@contextmanager
+def attached_samples(handle: dict):
+    """Map a published sample array into this process without copying it.
+
+    Yields a read-only float64 array backed by the shared block.  The
+    array, and any view of it, must not be kept after the with block ends.
+    """
+    block = shared_memory.SharedMemory(name=handle["name"], track=False)
+    data = np.ndarray(handle["count"], dtype=np.float64, buffer=block.buf)
+    data.flags.writeable = False
+    try:
+        yield data
+    finally:
+        del data
+        block.close()
+
+
+@app.function
+def release_samples(handle: dict) -> None:
+    """Free a published sample array once no stage needs it any more.
+
+    Only the handle's "name" is used.  Raises FileNotFoundError if the
+    block has already been released.
+    """
+    block = shared_memory.SharedMemory(name=handle["name"], track=False)
+    block.close()
+    block.unlink()
+
+
+@app.function
+def sample_quantiles(record: dict, q: tuple = (0.25, 0.5, 0.75)) -> dict:
+    """Quantiles of a group's published samples, read zero-copy.
+
+    *record* is any Stage 2 or 3 record that carries a "samples" handle.
+    """
+    with attached_samples(record["samples"]) as data:
+        values = np.quantile(data, q)
+    return {"group_id": record["group_id"], **dict(zip(q, values.tolist()))}
+
+
+@app.function
+def chunk_sizes(total: int, chunk_size: int) -> list[int]:
+    """Split *total* items into consecutive chunks of at most *chunk_size*."""
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, not {chunk_size}")
+    full, rest = divmod(total, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+@app.function
+def summarize_chunk(chunk: np.ndarray) -> dict:
+    """Return count, mean, sum of squared deviations (m2), min and max.
+
+    A chunk small enough to stay in cache is read from main memory once;
+    the extra passes for the deviations, min and max hit the cache.  The
+    mean and m2 are summed as np.mean and np.std sum them, so a single
+    chunk gives exactly their results.
+    """
+    count = int(chunk.size)
+    if count == 0:
+        return {
+            "count": 0,
+            "mean": 0.0,
+            "m2": 0.0,
+            "min": float("inf"),
+            "max": float("-inf"),
+        }
+    mean = float(np.mean(chunk))
+    dev = chunk.ravel() - mean
+    np.multiply(dev, dev, out=dev)
+    return {
+        "count": count,
+        "mean": mean,
+        "m2": float(np.sum(dev)),
+        "min": float(np.min(chunk)),
+        "max": float(np.max(chunk)),
+    }
+
+
+@app.function
+def merge_summaries(a: dict, b: dict) -> dict:
+    """Combine two partial summaries with Chan et al.'s parallel formula.
+
+    The result is the summary of the concatenation of the two inputs, so
+    partial summaries can be merged in any grouping, on any worker.
+    """
+    if a["count"] == 0:
+        return dict(b)
+    if b["count"] == 0:
+        return dict(a)
+    count = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+    return {
+        "count": count,
+        "mean": a["mean"] + delta * b["count"] / count,
+        "m2": a["m2"] + b["m2"] + delta * delta * a["count"] * b["count"] / count,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+    }
+
+
+@app.function
+def summarize_chunks(chunks) -> dict:
+    """Fold an iterable of arrays into a single summary in one pass.
+
+    Only one chunk needs to be in memory at a time, so *chunks* can be a
+    generator producing more data than fits in RAM.
+    """
+    summary = summarize_chunk(np.empty(0))
+    for chunk in chunks:
+        summary = merge_summaries(summary, summarize_chunk(chunk))
+    return summary
+
+
+@app.function
+@traced
+def process_groups_batch(params_list: list[dict]) -> list[dict]:
+    """Compute the same raw statistics as process_group for many groups at once.
+
+    Every group's samples are drawn into one flat buffer, and each group's
+    statistics come from segmented reductions (`np.add.reduceat` and
+    friends) over its slice of that buffer, so the per-group cost is one
+    generator call rather than a handful of reductions and a dict build.
+
+    Each group's segment starts with a zero slot.  `reduceat` adds the
+    first element of a segment to the pairwise sum of the rest, while
+    `np.sum` pairwise-sums the whole array starting from zero; the leading
+    zero makes the two agree, so results are bit-for-bit identical to
+    process_group for the same seeds in groups of up to STATS_CHUNK
+    samples, and agree to rounding in larger ones.
+    """
+    if not params_list:
+        return []
+    sizes = np.array([p["size"] for p in params_list])
+    heads = np.cumsum(sizes + 1) - (sizes + 1)
+    starts = heads + 1
+
+    buffer = np.zeros(int(heads[-1] + sizes[-1] + 1))
+    for params, start, size in zip(params_list, starts, sizes):
+        # normal(loc, 1.0) is loc + standard_normal, so shift after drawing.
+        segment = buffer[start : start + size]
+        np.random.default_rng(params["seed"]).standard_normal(out=segment)
+        segment += params["group_id"]
+
+    means = np.add.reduceat(buffer, heads) / sizes
+    sq_dev = np.repeat(means, sizes + 1)
+    np.subtract(buffer, sq_dev, out=sq_dev)
+    sq_dev[heads] = 0.0
+    sq_dev *= sq_dev
+    stds = np.sqrt(np.add.reduceat(sq_dev, heads) / sizes)
+    del sq_dev
+
+    # Alternate (start, end) indices so every other segment skips the slot
+    # in front of the next group; reduceat cannot take an index of len(buffer).
+    bounds = np.column_stack([starts, starts + sizes]).ravel()[:-1]
+    mins = np.minimum.reduceat(buffer, bounds)[::2]
+    maxs = np.maximum.reduceat(buffer, bounds)[::2]
+
+    return [
+        {
+            "group_id": params["group_id"],
+            "mean": float(mean),
+            "std": float(std),
+            "min": float(lo),
+            "max": float(hi),
+            "count": int(size),
+        }
+        for params, mean, std, lo, hi, size in zip(
+            params_list, means, stds, mins, maxs, sizes
+        )
+    ]
+
+
+@app.function
+def split_into_chunks(params_list: list[dict], chunk_size: int) -> list[dict]:
+    """Break every group into tasks of at most *chunk_size* samples.
+
+    Each task carries its group's seed and its own chunk index; the chunk's
+    samples come from a child of the group's seed sequence, so chunks can
+    be drawn independently, in any order, on any worker.
+    """
+    return [
+        {"group_id": p["group_id"], "seed": p["seed"], "chunk": k, "size": n}
+        for p in params_list
+        for k, n in enumerate(chunk_sizes(p["size"], chunk_size))
+    ]
+
+
+@app.function
+@traced
+def process_chunk(task: dict) -> dict:
+    """Draw one chunk's samples and return its mergeable partial summary."""
+    seed = np.random.SeedSequence(task["seed"], spawn_key=(task["chunk"],))
+    rng = np.random.default_rng(seed)
+    data = rng.normal(loc=task["group_id"], scale=1.0, size=task["size"])
+    return summarize_chunk(data)
+
+
+@app.function
+def process_groups_chunked(
+    params_list: list[dict], chunk_size: int = 50_000, max_workers: int | None = None
+) -> list[dict]:
+    """Compute Stage 2 statistics with groups split into work-stolen chunks.
+
+    One task per group leaves most workers idle while the largest groups
+    finish, because generate_params makes sizes grow with group_id.  Here
+    every group is split into chunks of roughly equal cost.  Each worker
+    thread owns a deque of chunks, dealt out largest first; it takes work
+    from the front of its own deque and, once that is empty, steals from
+    the back of the fullest other deque, so all workers stay busy until
+    the last chunk is taken.  Threads suffice because NumPy releases the
+    GIL while generating and reducing samples.
+
+    Partial summaries are merged per group in chunk order with Chan's
+    formula, so the result depends on *chunk_size* but not on the number
+    of workers or the order in which chunks ran.  Because every chunk is
+    drawn from its own child seed, the samples differ from the single
+    stream process_group draws; the statistics agree in distribution.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    tasks = split_into_chunks(params_list, chunk_size)
+    tasks.sort(key=lambda t: t["size"], reverse=True)
+    queues = [deque(tasks[i::workers]) for i in range(workers)]
+    partials = {}
+
+    def steal(me: int) -> dict | None:
+        for victim in sorted(range(workers), key=lambda i: -len(queues[i])):
+            if victim == me:
+                continue
+            try:
+                return queues[victim].pop()
+            except IndexError:
+                continue
+        return None
+
+    def work(me: int) -> None:
+        while True:
+            try:
+                task = queues[me].popleft()
+            except IndexError:
+                task = steal(me)
+                if task is None:
+                    return
+            partials[task["group_id"], task["chunk"]] = process_chunk(task)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = []
+    for params in params_list:
+        summary = summarize_chunk(np.empty(0))
+        for k in range(len(chunk_sizes(params["size"], chunk_size))):
+            summary = merge_summaries(summary, partials[params["group_id"], k])
+        results.append(summary_stats(params["group_id"], summary))
+    return results
+
+
+@app.function
+@traced
 def transform_stats(stats: dict) -> dict:
     """Derive normalized metrics from a single group's raw statistics.
 
@@ -77,32 +422,305 @@ def transform_stats(stats: dict) -> dict:
     mean = stats["mean"]
     std = stats["std"]
     count = stats["count"]
-    return {
+    transformed = {
         "group_id": stats["group_id"],
         "mean": mean,
         "cv": std / abs(mean) if mean != 0 else float("inf"),
         "range": stats["max"] - stats["min"],
         "stderr": std / np.sqrt(count),
     }
+    if "samples" in stats:
+        # Pass the shared-memory handle along so Stage 4 can attach too.
+        transformed["samples"] = stats["samples"]
+    return transformed
 
 
 @app.function
+@traced
+def transform_stats_batch(stats_list: list[dict]) -> list[dict]:
+    """Apply transform_stats to every record of a Stage 2 batch.
+
+    Calls the untraced transform_stats, so a batch records one span rather
+    than one per group.
+    """
+    return [transform_stats.__wrapped__(stats) for stats in stats_list]
+
+
+@app.function
+@traced
 def aggregate_results(transformed_list: list[dict]) -> dict:
     """Fan all per-group results into a single summary record.
 
     This step has a data dependency on *every* Stage 3 output, so it
     cannot start until the last Stage 3 worker finishes.
+
+    If the records carry published samples, this stage attaches to them
+    and the summary gains a "quantiles" list, one sample_quantiles record
+    per group.  The blocks are left for the caller to release.
     """
     means = [r["mean"] for r in transformed_list]
     cvs = [r["cv"] for r in transformed_list]
     ranges = [r["range"] for r in transformed_list]
-    return {
+    summary = {
         "n_groups": len(transformed_list),
         "grand_mean": float(np.mean(means)),
         "mean_cv": float(np.mean(cvs)),
         "mean_range": float(np.mean(ranges)),
         "best_group": int(transformed_list[int(np.argmin(cvs))]["group_id"]),
     }
+    if any("samples" in r for r in transformed_list):
+        summary["quantiles"] = [
+            sample_quantiles(r) for r in transformed_list if "samples" in r
+        ]
+    return summary
+
+
+@app.class_definition
+class ResultAggregator:
+    """Incremental, constant-memory equivalent of aggregate_results.
+
+    Instead of holding every Stage 3 record, keep running sums of the
+    quantities that are averaged plus the lowest CV seen so far.  Call
+    `update` as each record arrives, `merge` to combine aggregators built
+    on different workers, and `result` to get the summary record.  The
+    means agree with aggregate_results up to floating-point rounding; ties
+    in CV go to the lower group_id, as they do for np.argmin on a list in
+    group order.  Records that carry published samples are attached to as
+    they arrive, and their quantiles are returned in group order.
+    """
+
+    def __init__(self) -> None:
+        self.n_groups = 0
+        self.sum_mean = 0.0
+        self.sum_cv = 0.0
+        self.sum_range = 0.0
+        self.best_cv = float("inf")
+        self.best_group = None
+        self.quantiles = []
+
+    def update(self, record: dict) -> "ResultAggregator":
+        """Fold one Stage 3 record into the running totals."""
+        self.n_groups += 1
+        self.sum_mean += record["mean"]
+        self.sum_cv += record["cv"]
+        self.sum_range += record["range"]
+        self._offer_best(record["cv"], record["group_id"])
+        if "samples" in record:
+            self.quantiles.append(sample_quantiles(record))
+        return self
+
+    def merge(self, other: "ResultAggregator") -> "ResultAggregator":
+        """Fold another aggregator's totals into this one."""
+        self.n_groups += other.n_groups
+        self.sum_mean += other.sum_mean
+        self.sum_cv += other.sum_cv
+        self.sum_range += other.sum_range
+        if other.best_group is not None:
+            self._offer_best(other.best_cv, other.best_group)
+        self.quantiles.extend(other.quantiles)
+        return self
+
+    def result(self) -> dict:
+        """Return the same summary record as aggregate_results."""
+        if self.n_groups == 0:
+            raise ValueError("no results to aggregate")
+        summary = {
+            "n_groups": self.n_groups,
+            "grand_mean": float(self.sum_mean / self.n_groups),
+            "mean_cv": float(self.sum_cv / self.n_groups),
+            "mean_range": float(self.sum_range / self.n_groups),
+            "best_group": int(self.best_group),
+        }
+        if self.quantiles:
+            summary["quantiles"] = sorted(self.quantiles, key=lambda q: q["group_id"])
+        return summary
+
+    def _offer_best(self, cv: float, group_id: int) -> None:
+        if self.best_group is None or (cv, group_id) < (self.best_cv, self.best_group):
+            self.best_cv = cv
+            self.best_group = group_id
+
+
+@app.function
+def process_and_transform(params: dict, block_prefix: str | None = None) -> dict:
+    """Run Stages 2 and 3 for one group in a single call.
+
+    Fusing the two stages means a pool worker receives one params dict and
+    sends back one transformed record, so the raw statistics never have to
+    be pickled back to the parent process and out again.  With
+    *block_prefix*, the group's samples are published to shared memory
+    under the name returned by sample_block_name.
+    """
+    if block_prefix is None:
+        return transform_stats(process_group(params))
+    name = sample_block_name(block_prefix, params["group_id"])
+    return transform_stats(process_group(params, publish=True, block_name=name))
+
+
+@app.function
+def sample_block_name(block_prefix: str, group_id: int) -> str:
+    """Name of the shared-memory block holding one group's published samples."""
+    return f"{block_prefix}_{group_id}"
+
+
+@app.function
+def process_and_transform_checkpointed(params: dict, run_dir: str) -> dict:
+    """process_and_transform, saving the result into the run directory."""
+    record = process_and_transform(params)
+    RunDirectory(run_dir).save(
+        "process_and_transform", params["group_id"], params, record
+    )
+    return record
+
+
+@app.function
+def run_pipeline(
+    n_groups: int = N_GROUPS,
+    executor: str = "process",
+    max_workers: int | None = None,
+    size_scale: float = 1.0,
+    run_dir: str | None = None,
+    publish: bool = False,
+) -> dict:
+    """Run all four stages, fanning Stages 2 and 3 out across a pool.
+
+    *executor* is "process" (a ProcessPoolExecutor, for CPU-bound work),
+    "thread" (a ThreadPoolExecutor, for stages that release the GIL or
+    wait on I/O), or "serial" (a plain loop, useful as a baseline).
+    Results come back in group order, so the summary is identical to the
+    one produced by running the stages one after another.
+
+    With *run_dir*, every group's result is saved there as soon as it is
+    computed (see checkpoint.py), and groups already saved from the same
+    params are read back instead of recomputed, so an interrupted run
+    picks up where it stopped.
+
+    With *publish*, Stage 2 publishes every group's samples to shared
+    memory and Stage 4 attaches to them, adding per-group "quantiles" to
+    the summary.  Every block is released before this function returns,
+    including when a stage raises.  Published results cannot be saved to
+    a run directory, so *publish* and *run_dir* are mutually exclusive.
+    """
+    params_list = generate_params(n_groups, size_scale)
+    step = process_and_transform
+    pending = params_list
+    if publish:
+        if run_dir is not None:
+            raise ValueError("published samples cannot be checkpointed")
+        block_prefix = f"nb_{secrets.token_hex(4)}"
+        step = functools.partial(process_and_transform, block_prefix=block_prefix)
+        try:
+            return aggregate_results(
+                map_groups(step, params_list, executor, max_workers)
+            )
+        finally:
+            for params in params_list:
+                with suppress(FileNotFoundError):
+                    release_samples(
+                        {"name": sample_block_name(block_prefix, params["group_id"])}
+                    )
+    if run_dir is not None:
+        run = RunDirectory(run_dir)
+        step = functools.partial(
+            process_and_transform_checkpointed, run_dir=str(run.root)
+        )
+        pending = [
+            p
+            for p in params_list
+            if not run.is_complete("process_and_transform", p["group_id"], p)
+        ]
+
+    computed = map_groups(step, pending, executor, max_workers)
+    if pending is params_list:
+        return aggregate_results(computed)
+    computed_by_id = {p["group_id"]: r for p, r in zip(pending, computed)}
+    transformed = [
+        computed_by_id.get(p["group_id"])
+        or run.load("process_and_transform", p["group_id"])
+        for p in params_list
+    ]
+    return aggregate_results(transformed)
+
+
+@app.function
+def map_groups(
+    step, params_list: list[dict], executor: str, max_workers: int | None
+) -> list[dict]:
+    """Apply *step* to every params dict on the executor run_pipeline names."""
+    if executor == "serial":
+        return [step(p) for p in params_list]
+    pools = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+    if executor not in pools:
+        raise ValueError(
+            f"unknown executor {executor!r}: expected one of 'process', 'thread', 'serial'"
+        )
+    # Batching several groups per task amortizes inter-process overhead
+    # when there are thousands of small groups (thread pools ignore
+    # chunksize).
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(params_list) // (4 * workers))
+    with pools[executor](max_workers=max_workers) as pool:
+        return list(pool.map(step, params_list, chunksize=chunksize))
+
+
+@app.function
+async def run_pipeline_async(
+    n_groups: int = N_GROUPS,
+    process=process_group,
+    transform=transform_stats,
+    concurrency: int = 8,
+    queue_size: int = 16,
+    size_scale: float = 1.0,
+) -> dict:
+    """Run the pipeline on an asyncio event loop with bounded stage queues.
+
+    *process* and *transform* may be coroutine functions, which are awaited
+    on the loop (e.g. stages that fetch remote data), or plain functions,
+    which run on a thread pool of *concurrency* workers so they never block
+    the loop.  Each stage has *concurrency* worker tasks, and the queues
+    between stages hold at most *queue_size* items: a slow stage makes the
+    stage before it wait instead of piling up results in memory.  Stage 3
+    results are folded into a ResultAggregator as they arrive.
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    params_queue = asyncio.Queue(maxsize=queue_size)
+    stats_queue = asyncio.Queue(maxsize=queue_size)
+    aggregator = ResultAggregator()
+
+    async def call(func, arg):
+        if inspect.iscoroutinefunction(func):
+            return await func(arg)
+        return await loop.run_in_executor(pool, func, arg)
+
+    async def generate():
+        for params in generate_params(n_groups, size_scale):
+            await params_queue.put(params)
+        for _ in range(concurrency):
+            await params_queue.put(done)
+
+    async def process_worker():
+        while (params := await params_queue.get()) is not done:
+            await stats_queue.put(await call(process, params))
+
+    async def transform_worker():
+        while (stats := await stats_queue.get()) is not done:
+            aggregator.update(await call(transform, stats))
+
+    async def process_stage():
+        async with asyncio.TaskGroup() as group:
+            for _ in range(concurrency):
+                group.create_task(process_worker())
+        for _ in range(concurrency):
+            await stats_queue.put(done)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(generate())
+            group.create_task(process_stage())
+            for _ in range(concurrency):
+                group.create_task(transform_worker())
+    return aggregator.result()
 
 
 @app.cell
@@ -200,5 +818,185 @@ def _(mo, transformed):
     return (summary,)
 
 
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## All four stages on a worker pool
+
+        `run_pipeline` runs Stages 2 and 3 as one fused task per group on a
+        `concurrent.futures` pool and feeds the results to Stage 4.  The
+        summary must match the one computed cell by cell above.
+        """
+    )
+    return
+
+
+@app.cell
+def _(mo, summary):
+    pooled = run_pipeline(executor="thread")
+    mo.md(f"Pooled summary matches sequential summary: **{pooled == summary}**")
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Where the time goes
+
+        With tracing enabled, every stage call records a span: start and end
+        time, the process and thread that ran it, its input size and the size
+        of its pickled result.  The Luigi version records the same per-group
+        spans; the batched Dagster and Metaflow versions record one
+        `process_groups_batch` and one `transform_stats_batch` span per batch.
+        `tracing.write_chrome_trace` saves them for viewing in Perfetto or
+        `chrome://tracing`.
+        """
+    )
+    return
+
+
+@app.cell
+def _(pl):
+    import tempfile
+
+    import tracing
+
+    _trace_dir = tracing.enable(tempfile.mkdtemp(prefix="pipeline_trace_"))
+    run_pipeline(executor="process")
+    tracing.disable()
+    tracing.spans_frame(tracing.load_spans(_trace_dir)).group_by("name").agg(
+        calls=pl.len(),
+        workers=pl.col("pid").n_unique(),
+        total_ms=pl.col("duration_ms").sum(),
+        bytes_serialized=pl.col("bytes_serialized").sum(),
+    ).sort("name")
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Running on the event loop
+
+        `run_pipeline_async` accepts coroutine stages as well as plain ones, so
+        a stage that waits on the network does not block the notebook kernel.
+        Plain stages run on a bounded thread pool; bounded queues between the
+        stages provide backpressure.
+        """
+    )
+    return
+
+
+@app.cell
+async def _(mo, summary):
+    async_summary = await run_pipeline_async()
+    mo.md(
+        f"Event-loop summary matches sequential summary: "
+        f"**{async_summary['best_group'] == summary['best_group']}**"
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Sharing raw samples between stages
+
+        With `publish=True`, Stage 2 draws its samples into shared memory and
+        returns a small handle instead of discarding them.  Any later stage, in
+        any process on this machine, can attach to the same bytes without a
+        copy: here the workers pass the handles on and Stage 4 computes the
+        quartiles of each group from them.  `run_pipeline` releases the blocks
+        before it returns, even if a stage fails.
+        """
+    )
+    return
+
+
+@app.cell
+def _(pl):
+    published = run_pipeline(executor="process", publish=True)
+    pl.DataFrame(
+        [
+            {"group_id": r["group_id"], "q1": r[0.25], "median": r[0.5], "q3": r[0.75]}
+            for r in published["quantiles"]
+        ]
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Splitting skewed groups into chunks
+
+        Group sizes grow with `group_id`, so with one task per group the
+        workers that draw the small groups sit idle while the last group
+        finishes.  `process_groups_chunked` splits every group into chunks of
+        at most `chunk_size` samples, lets idle worker threads steal chunks
+        from busy ones, and merges the partial statistics per group.  Each
+        chunk has its own child seed, so the numbers differ slightly from
+        Stage 2's but come from the same distribution.
+        """
+    )
+    return
+
+
+@app.cell
+def _(params_list, pl, raw_stats):
+    chunked_stats = process_groups_chunked(params_list, chunk_size=100)
+    pl.DataFrame(
+        [
+            {
+                "group_id": whole["group_id"],
+                "count": chunked["count"],
+                "mean": whole["mean"],
+                "chunked_mean": chunked["mean"],
+                "std": whole["std"],
+                "chunked_std": chunked["std"],
+            }
+            for whole, chunked in zip(raw_stats, chunked_stats)
+        ]
+    )
+    return
+
+
+@app.cell
+def _(mo):
+    mo.md(
+        r"""
+        ## Reusing results across runs
+
+        `caching.cached` keys each call on a hash of the function's source and
+        its arguments and keeps the result on disk, in a directory shared with
+        the Luigi, Dagster and Metaflow versions.  Re-run this cell: every
+        call after the first run is a hit.
+        """
+    )
+    return
+
+
+@app.cell
+def _(params_list, pl):
+    from caching import cached
+
+    cached_process_group = cached(process_group)
+    cached_transform_stats = cached(transform_stats)
+    for _params in params_list:
+        cached_transform_stats(cached_process_group(_params))
+    pl.DataFrame(
+        [
+            {"stage": "process_group", **cached_process_group.cache_info()},
+            {"stage": "transform_stats", **cached_transform_stats.cache_info()},
+        ]
+    )
+    return
+
+
 if __name__ == "__main__":
     app.run()
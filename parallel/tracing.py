@@ -0,0 +1,224 @@
+"""Per-stage tracing for the four-stage pipeline.
+
+Usage:
+    import tracing
+    from parallel import run_pipeline
+
+    tracing.enable("trace")                 # directory for span files
+    run_pipeline(64, executor="process")
+    spans = tracing.load_spans("trace")
+    tracing.write_chrome_trace(spans, "trace.json")   # open in ui.perfetto.dev
+    tracing.spans_frame(spans)                         # polars DataFrame
+
+The stage functions in parallel.py are wrapped with `traced`, so every entry
+point that calls them (the notebook, run_pipeline, Luigi, Dagster and
+Metaflow) emits a span named after each stage function it calls.  The
+notebook, run_pipeline and Luigi call process_group and transform_stats once
+per group; Dagster and Metaflow call process_groups_batch and
+transform_stats_batch once per batch, so compare backends by stage rather
+than by span name.
+Each span records the stage name, start and end times, the process and
+thread that ran it, the size of its input and the number of bytes its
+result takes when pickled (what a process boundary would have to carry).
+
+Tracing is off unless `enable` has been called or PIPELINE_TRACE_DIR is set
+in the environment.  `enable` sets that variable too, so worker processes
+started afterwards (pool workers, Luigi workers, Metaflow steps) trace into
+the same directory.  When tracing is off a traced call costs one flag test.
+
+Each process appends its spans, one JSON object per line, to its own file
+spans-<pid>.jsonl in the trace directory, so no locking is needed.
+"""
+
+import atexit
+import functools
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ENV_VAR = "PIPELINE_TRACE_DIR"
+
+_trace_dir = os.environ.get(ENV_VAR)
+_sink = None
+_sink_pid = None
+
+
+# ---------------------------------------------------------------------------
+# Switching tracing on and off
+# ---------------------------------------------------------------------------
+
+def enable(trace_dir: Path | str) -> Path:
+    """Start recording spans into *trace_dir* in this and future child processes."""
+    global _trace_dir
+    trace_dir = Path(trace_dir).resolve()
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    os.environ[ENV_VAR] = str(trace_dir)
+    _trace_dir = str(trace_dir)
+    return trace_dir
+
+
+def disable() -> None:
+    """Stop recording spans."""
+    global _trace_dir
+    os.environ.pop(ENV_VAR, None)
+    _trace_dir = None
+    _close_sink()
+
+
+def is_enabled() -> bool:
+    return _trace_dir is not None
+
+
+# ---------------------------------------------------------------------------
+# Recording spans
+# ---------------------------------------------------------------------------
+
+def _close_sink() -> None:
+    global _sink, _sink_pid
+    if _sink is not None:
+        _sink.close()
+    _sink = None
+    _sink_pid = None
+
+
+atexit.register(_close_sink)
+
+
+def _write(record: dict) -> None:
+    # Reopen after a fork so that each process writes to its own file.
+    global _sink, _sink_pid
+    pid = os.getpid()
+    trace_dir = Path(_trace_dir)
+    if _sink is None or _sink_pid != pid or Path(_sink.name).parent != trace_dir:
+        _close_sink()
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        # Kept open across spans; _close_sink closes it.
+        _sink = open(trace_dir / f"spans-{pid}.jsonl", "a", buffering=1)  # noqa: SIM115
+        _sink_pid = pid
+    _sink.write(json.dumps(record) + "\n")
+
+
+def input_size(value) -> int | None:
+    """A rough size for a stage input: samples, records or groups."""
+    if isinstance(value, dict):
+        return value.get("size", value.get("count"))
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    if isinstance(value, int):
+        return value
+    return None
+
+
+@contextmanager
+def span(name: str, size: int | None = None):
+    """Record the enclosed block as one span called *name*.
+
+    Yields a dict; storing a "result" in it makes the span record how many
+    bytes that result pickles to, and storing a "size" overrides *size* for
+    blocks that only learn their input size as they go.
+    """
+    if _trace_dir is None:
+        yield {}
+        return
+    extra = {}
+    start = time.time_ns()
+    try:
+        yield extra
+    finally:
+        end = time.time_ns()
+        result = extra.get("result")
+        _write(
+            {
+                "name": name,
+                "start_ns": start,
+                "end_ns": end,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "input_size": extra.get("size", size),
+                "bytes_serialized": (
+                    len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+                    if result is not None
+                    else None
+                ),
+            }
+        )
+
+
+def traced(func):
+    """Record a span named after *func* for every call while tracing is on."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _trace_dir is None:
+            return func(*args, **kwargs)
+        with span(func.__name__, input_size(args[0]) if args else None) as extra:
+            extra["result"] = func(*args, **kwargs)
+        return extra["result"]
+
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Reading and exporting spans
+# ---------------------------------------------------------------------------
+
+def load_spans(trace_dir: Path | str | None = None) -> list[dict]:
+    """Read every span recorded in *trace_dir* (default: the current one)."""
+    trace_dir = Path(trace_dir or _trace_dir)
+    spans = []
+    for path in sorted(trace_dir.glob("spans-*.jsonl")):
+        with open(path) as fh:
+            spans.extend(json.loads(line) for line in fh if line.strip())
+    spans.sort(key=lambda s: s["start_ns"])
+    return spans
+
+
+def chrome_trace(spans: list[dict]) -> dict:
+    """Convert spans to Chrome trace-event format (complete "X" events)."""
+    return {
+        "traceEvents": [
+            {
+                "name": s["name"],
+                "cat": "pipeline",
+                "ph": "X",
+                "ts": s["start_ns"] / 1000,
+                "dur": (s["end_ns"] - s["start_ns"]) / 1000,
+                "pid": s["pid"],
+                "tid": s["tid"],
+                "args": {
+                    "input_size": s["input_size"],
+                    "bytes_serialized": s["bytes_serialized"],
+                },
+            }
+            for s in spans
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def write_chrome_trace(spans: list[dict], path: Path | str) -> None:
+    """Write spans as a trace file for chrome://tracing or Perfetto."""
+    with open(path, "w") as fh:
+        json.dump(chrome_trace(spans), fh)
+
+
+def spans_frame(spans: list[dict]):
+    """Return spans as a polars DataFrame with a duration_ms column."""
+    import polars as pl
+
+    schema = {
+        "name": pl.String,
+        "start_ns": pl.Int64,
+        "end_ns": pl.Int64,
+        "pid": pl.Int64,
+        "tid": pl.Int64,
+        "input_size": pl.Int64,
+        "bytes_serialized": pl.Int64,
+    }
+    return pl.DataFrame(spans, schema=schema).with_columns(
+        duration_ms=(pl.col("end_ns") - pl.col("start_ns")) / 1e6
+    )
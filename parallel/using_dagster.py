@@ -6,67 +6,138 @@ Launch with:
 
 Topology
 --------
-generate_params_op  ──DynamicOut──>  process_group_op  ──>  transform_stats_op  ──collect──>  aggregate_results_op
-(Stage 1)                            (Stage 2, N tasks)      (Stage 3, N tasks)                (Stage 4)
+generate_params_op  ──DynamicOut──>  process_batch_op  ──>  transform_batch_op  ──collect──>  aggregate_results_op
+(Stage 1)                            (Stage 2, B tasks)      (Stage 3, B tasks)                (Stage 4)
 
 The key primitives:
-- `DynamicOut` / `DynamicOutput`  — yield one output per group from Stage 1.
+- `DynamicOut` / `DynamicOutput`  — yield one output per batch from Stage 1.
 - `.map(op)`                      — apply an op to each dynamic output independently.
 - `.collect()`                    — gather all dynamic outputs into a list for Stage 4.
+
+Dagster spends milliseconds starting, logging and storing the output of
+every op, far more than Stages 2 and 3 take for a typical group.  The
+batch_size setting of generate_params_op therefore controls how many groups
+each dynamic branch carries: with N groups there are B = ceil(N / batch_size)
+branches, Stage 2 computes a whole batch in one vectorized call
+(process_groups_batch, which matches process_group), Stage 3 transforms
+it in one call (transform_stats_batch), and `.collect()` gathers B lists
+instead of N records.  The default of 1 keeps one branch per group; to
+batch, run with e.g.
+
+    ops:
+      generate_params_op:
+        config: {n_groups: 10000, batch_size: 250}
+
+Resuming
+--------
+execute_in_process runs against an ephemeral instance, so Dagster itself
+keeps nothing between runs.  Stages 2 and 3 therefore save each batch's
+output in a persistent run directory, runs/dagster (see checkpoint.py; set
+PIPELINE_RUN_DIR to put runs/ elsewhere), keyed by the batch's first
+group_id and the hash of its input.  A re-run skips every batch whose input
+is unchanged and whose output is still there, so only missing or stale
+batches are computed.  Changing batch_size regroups the batches, and every
+batch then counts as new.
 """
 
-from dagster import DynamicOut, DynamicOutput, OpExecutionContext, job, op
+from caching import cached
+from checkpoint import RunDirectory, default_run_dir
+from dagster import DynamicOut, DynamicOutput, Field, OpExecutionContext, job, op
+from tracing import span, traced
 
 from parallel import (
-    aggregate_results,
+    N_GROUPS,
+    ResultAggregator,
     generate_params,
-    process_group,
-    transform_stats,
+    process_groups_batch,
+    transform_stats_batch,
 )
 
-
-@op(out=DynamicOut())
+# Stages 2 and 3 are pure functions of their inputs, so results computed by
+# an earlier run are reused from the shared disk cache.  Each batch is one
+# entry, so a miss costs one file write per batch rather than per group.
+# The cache goes inside the tracing wrapper so that hits still appear as spans.
+process_groups_batch = traced(cached(process_groups_batch.__wrapped__))
+transform_stats_batch = traced(cached(transform_stats_batch.__wrapped__))
+
+# Persistent run directory (all ops in all runs share this)
+RUN = RunDirectory(default_run_dir("dagster"))
+
+
+def checkpointed(stage: str, func, batch: list) -> list:
+    """Return *func(batch)*, reusing the run directory's copy if it is current."""
+    batch_id = batch[0]["group_id"]
+    if RUN.is_complete(stage, batch_id, batch):
+        return RUN.load(stage, batch_id)
+    result = func(batch)
+    RUN.save(stage, batch_id, batch, result)
+    return result
+
+
+@op(
+    out=DynamicOut(),
+    config_schema={
+        "n_groups": Field(int, default_value=N_GROUPS),
+        "size_scale": Field(float, default_value=1.0),
+        "batch_size": Field(int, default_value=1, description="groups per branch"),
+    },
+)
 def generate_params_op(context: OpExecutionContext):
-    """Stage 1 — generate parameter sets and fan out via DynamicOutput.
+    """Stage 1 — generate parameter sets and fan them out in batches.
 
-    Yielding a DynamicOutput for each group tells Dagster to create one
+    Yielding a DynamicOutput for each batch tells Dagster to create one
     independent execution of any downstream op that consumes this output.
     The mapping_key must be a valid Python identifier; it appears in the
     run UI to identify each dynamic branch.
     """
-    for params in generate_params():
-        gid = params["group_id"]
-        context.log.info(f"Emitting params for group {gid}")
-        yield DynamicOutput(params, mapping_key=f"group_{gid}")
+    config = context.op_config
+    params_list = generate_params(config["n_groups"], config["size_scale"])
+    batch_size = max(1, config["batch_size"])
+    for start in range(0, len(params_list), batch_size):
+        batch = params_list[start : start + batch_size]
+        first, last = batch[0]["group_id"], batch[-1]["group_id"]
+        context.log.info(f"Emitting params for groups {first}-{last}")
+        yield DynamicOutput(batch, mapping_key=f"groups_{first}_{last}")
 
 
 @op
-def process_group_op(context: OpExecutionContext, params: dict) -> dict:
-    """Stage 2 — compute raw statistics for one group."""
-    stats = process_group(params)
-    context.log.info(f"Processed group {stats['group_id']}: mean={stats['mean']:.3f}")
-    return stats
+def process_batch_op(context: OpExecutionContext, params_batch: list) -> list:
+    """Stage 2 — compute raw statistics for one batch of groups."""
+    stats_batch = checkpointed("stats", process_groups_batch, params_batch)
+    context.log.info(f"Processed {len(stats_batch)} groups")
+    return stats_batch
 
 
 @op
-def transform_stats_op(context: OpExecutionContext, stats: dict) -> dict:
-    """Stage 3 — derive normalized metrics for one group."""
-    transformed = transform_stats(stats)
-    context.log.info(
-        f"Transformed group {transformed['group_id']}: cv={transformed['cv']:.3f}"
-    )
-    return transformed
+def transform_batch_op(context: OpExecutionContext, stats_batch: list) -> list:
+    """Stage 3 — derive normalized metrics for one batch of groups."""
+    transformed_batch = checkpointed("transformed", transform_stats_batch, stats_batch)
+    context.log.info(f"Transformed {len(transformed_batch)} groups")
+    return transformed_batch
 
 
 @op
-def aggregate_results_op(context: OpExecutionContext, transformed_list: list) -> dict:
+def aggregate_results_op(
+    context: OpExecutionContext, transformed_batches: list
+) -> dict:
     """Stage 4 — fan all Stage 3 results into a single summary.
 
-    `transformed_list` is populated by calling `.collect()` on the dynamic
-    output of transform_stats_op in the job definition below.  Dagster
-    guarantees that every dynamic branch has completed before this op runs.
+    `transformed_batches` is populated by calling `.collect()` on the
+    dynamic output of transform_batch_op in the job definition below.
+    Dagster guarantees that every dynamic branch has completed before this
+    op runs.  Each batch is folded into its own ResultAggregator and the
+    partial aggregators are merged, so no flattened list of every record
+    is built.
     """
-    summary = aggregate_results(transformed_list)
+    with span("aggregate_results") as traced_call:
+        aggregator = ResultAggregator()
+        for batch in transformed_batches:
+            partial = ResultAggregator()
+            for record in batch:
+                partial.update(record)
+            aggregator.merge(partial)
+        traced_call["size"] = aggregator.n_groups
+        summary = traced_call["result"] = aggregator.result()
     context.log.info(f"Summary: {summary}")
     return summary
 
@@ -82,12 +153,12 @@ def parallel_pipeline_job():
     # Stage 1 → fan out
     params = generate_params_op()
 
-    # Stage 2 — one execution per group
-    stats = params.map(process_group_op)
+    # Stage 2 — one execution per batch
+    stats = params.map(process_batch_op)
 
     # Stage 3 — one execution per Stage 2 result (chained .map keeps the
     # same set of dynamic keys; no extra fan-out or fan-in occurs here)
-    transformed = stats.map(transform_stats_op)
+    transformed = stats.map(transform_batch_op)
 
     # Stage 4 — fan in: .collect() waits for all branches and returns a list
     aggregate_results_op(transformed.collect())
@@ -16,58 +16,149 @@ Luigi expresses parallelism through requires(): when a task's requires() list
 contains N independent tasks, Luigi's worker pool runs them concurrently.
 The fan-out is implicit in the list comprehension inside AggregateResults and
 TransformStats.  Targets on the local filesystem act as the data bus between
-tasks, giving Luigi idempotent, resumable execution for free.
-
-Intermediate files are written to a temporary directory and cleaned up when
-AggregateResults completes.  To keep them for inspection, comment out the
-cleanup block in AggregateResults.run().
+tasks.
+
+Intermediate files live in a persistent run directory, runs/luigi (set
+PIPELINE_RUN_DIR to put runs/ elsewhere), together with a manifest of the
+(stage, group_id, input hash) of every output written (see checkpoint.py).
+A task counts as complete only when the manifest says its output was
+computed from the input it would get now, so re-running after a crash, or
+with more groups or a different --size-scale, executes only the groups
+whose outputs are missing or stale.  Delete the directory to start afresh.
 """
 
 import json
-import shutil
+import os
 import tempfile
 from pathlib import Path
 
 import luigi
+import pyarrow as pa
+from caching import cached
+from checkpoint import RunDirectory, default_run_dir
+from tracing import span, traced
 
 from parallel import (
-    aggregate_results,
+    ResultAggregator,
     generate_params,
     process_group,
     transform_stats,
 )
 
+# Stages 2 and 3 are pure functions of their inputs, so results computed by
+# an earlier run of any backend are reused from the shared disk cache.  The
+# cache goes inside the tracing wrapper so that hits still appear as spans.
+process_group = traced(cached(process_group.__wrapped__))
+transform_stats = traced(cached(transform_stats.__wrapped__))
+
+# ---------------------------------------------------------------------------
+# Persistent run directory (all tasks in all runs share this)
+# ---------------------------------------------------------------------------
+
+RUN = RunDirectory(default_run_dir("luigi"))
+
+
 # ---------------------------------------------------------------------------
-# Shared scratch directory (all tasks in one run share this)
+# Arrow target (the data bus between tasks)
 # ---------------------------------------------------------------------------
 
-SCRATCH_DIR = Path(tempfile.mkdtemp(prefix="luigi_pipeline_"))
+class ArrowTarget(luigi.LocalTarget):
+    """A local file holding a table of records in Arrow IPC format.
+
+    Writes go to a temporary file that is renamed into place, replacing
+    any stale version, so a half-written file is never read.  Reads memory-map
+    the file: the table's buffers point straight at the page cache, and
+    selecting one row only touches the pages that hold it.
+    """
+
+    def write(self, records: list[dict]) -> None:
+        table = pa.Table.from_pylist(records)
+        self.makedirs()
+        fd, tmp_path = tempfile.mkstemp(dir=Path(self.path).parent, suffix=".tmp")
+        os.close(fd)
+        with (
+            pa.OSFile(tmp_path, "wb") as sink,
+            pa.ipc.new_file(sink, table.schema) as writer,
+        ):
+            writer.write_table(table)
+        os.replace(tmp_path, self.path)
+
+    def read(self) -> pa.Table:
+        return pa.ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+
+    def read_row(self, index: int) -> dict:
+        return self.read().slice(index, 1).to_pylist()[0]
+
+
+def stage_partition(stage: str, group_id: int | None) -> Path:
+    """Path of one group's partition within a stage's Arrow dataset."""
+    return RUN.output_path(stage, group_id, ".arrow")
+
+
+class CheckpointedTask(luigi.Task):
+    """A task whose completeness is decided by the run manifest.
+
+    Subclasses name their *stage* and say which input decides whether
+    their output is current (checkpoint_input) and how to compute the
+    output from it (compute).  An upstream task that is about to re-run
+    may change that input, so this task is incomplete until they all are
+    complete; if its input then turns out to be unchanged, run() keeps
+    the existing output instead of recomputing it.
+    """
+
+    stage: str
+
+    def checkpoint_id(self) -> int | None:
+        return getattr(self, "group_id", None)
+
+    def checkpoint_input(self):
+        raise NotImplementedError
+
+    def compute(self, inputs) -> list[dict]:
+        raise NotImplementedError
+
+    def complete(self) -> bool:
+        if not all(task.complete() for task in luigi.task.flatten(self.requires())):
+            return False
+        return RUN.is_complete(
+            self.stage, self.checkpoint_id(), self.checkpoint_input()
+        )
+
+    def run(self) -> None:
+        inputs = self.checkpoint_input()
+        if RUN.is_complete(self.stage, self.checkpoint_id(), inputs):
+            return
+        self.output().write(self.compute(inputs))
+        RUN.record(self.stage, self.checkpoint_id(), inputs, self.output().path)
 
 
 # ---------------------------------------------------------------------------
 # Luigi tasks
 # ---------------------------------------------------------------------------
 
-class GenerateParams(luigi.Task):
-    """Stage 1 — write the parameter list to a JSON file.
+class GenerateParams(CheckpointedTask):
+    """Stage 1 — write the parameter list to an Arrow table.
 
     This task has no upstream dependencies.  Its output acts as the data
     source for every Stage 2 task, but Luigi reads it lazily: each
-    ProcessGroup instance opens only the slice it needs.
+    ProcessGroup instance memory-maps the table and reads only its own row.
     """
 
+    stage = "params"
     n_groups: int = luigi.IntParameter(default=4)
+    size_scale: float = luigi.FloatParameter(default=1.0)
 
-    def output(self) -> luigi.LocalTarget:
-        return luigi.LocalTarget(SCRATCH_DIR / "params.json")
+    def output(self) -> ArrowTarget:
+        return ArrowTarget(stage_partition(self.stage, None))
 
-    def run(self) -> None:
-        params = generate_params(self.n_groups)
-        with self.output().open("w") as fh:
-            json.dump(params, fh, indent=2)
+    def checkpoint_input(self) -> dict:
+        return {"n_groups": self.n_groups, "size_scale": self.size_scale}
 
+    def compute(self, inputs: dict) -> list[dict]:
+        return generate_params(inputs["n_groups"], inputs["size_scale"])
 
-class ProcessGroup(luigi.Task):
+
+class ProcessGroup(CheckpointedTask):
     """Stage 2 — compute raw statistics for one group.
 
     One instance of this task is created per group.  Luigi schedules all
@@ -75,89 +166,101 @@ class ProcessGroup(luigi.Task):
     upstream task (GenerateParams) but write to distinct output files.
     """
 
+    stage = "stats"
     group_id: int = luigi.IntParameter()
     n_groups: int = luigi.IntParameter(default=4)
+    size_scale: float = luigi.FloatParameter(default=1.0)
 
     def requires(self) -> GenerateParams:
-        return GenerateParams(n_groups=self.n_groups)
+        return GenerateParams(n_groups=self.n_groups, size_scale=self.size_scale)
 
-    def output(self) -> luigi.LocalTarget:
-        return luigi.LocalTarget(SCRATCH_DIR / f"stats_{self.group_id}.json")
+    def output(self) -> ArrowTarget:
+        return ArrowTarget(stage_partition(self.stage, self.group_id))
 
-    def run(self) -> None:
-        with self.input().open() as fh:
-            all_params = json.load(fh)
-        params = next(p for p in all_params if p["group_id"] == self.group_id)
-        stats = process_group(params)
-        with self.output().open("w") as fh:
-            json.dump(stats, fh, indent=2)
+    def checkpoint_input(self) -> dict:
+        # generate_params emits groups in order, so group_id is the row index.
+        return self.input().read_row(self.group_id)
+
+    def compute(self, params: dict) -> list[dict]:
+        return [process_group(params)]
 
 
-class TransformStats(luigi.Task):
+class TransformStats(CheckpointedTask):
     """Stage 3 — derive normalized metrics for one group.
 
     Each instance depends on exactly one ProcessGroup instance.  Luigi
     parallelises all N instances the same way it did in Stage 2.
     """
 
+    stage = "transformed"
     group_id: int = luigi.IntParameter()
     n_groups: int = luigi.IntParameter(default=4)
+    size_scale: float = luigi.FloatParameter(default=1.0)
 
     def requires(self) -> ProcessGroup:
-        return ProcessGroup(group_id=self.group_id, n_groups=self.n_groups)
+        return ProcessGroup(
+            group_id=self.group_id, n_groups=self.n_groups, size_scale=self.size_scale
+        )
 
-    def output(self) -> luigi.LocalTarget:
-        return luigi.LocalTarget(SCRATCH_DIR / f"transformed_{self.group_id}.json")
+    def output(self) -> ArrowTarget:
+        return ArrowTarget(stage_partition(self.stage, self.group_id))
 
-    def run(self) -> None:
-        with self.input().open() as fh:
-            stats = json.load(fh)
-        transformed = transform_stats(stats)
-        with self.output().open("w") as fh:
-            json.dump(transformed, fh, indent=2)
+    def checkpoint_input(self) -> dict:
+        return self.input().read_row(0)
+
+    def compute(self, stats: dict) -> list[dict]:
+        return [transform_stats(stats)]
 
 
-class AggregateResults(luigi.Task):
+class AggregateResults(CheckpointedTask):
     """Stage 4 — fan all Stage 3 results into a single summary.
 
     requires() returns a list of N TransformStats instances.  Luigi treats
     each element as an independent prerequisite and runs them in parallel.
     self.input() mirrors the structure of requires(), so it is also a list of
-    N LocalTarget objects.
+    N ArrowTarget objects.
 
     This task does not start until every TransformStats instance has written
     its output file, giving us the fan-in guarantee.
     """
 
+    stage = "summary"
     n_groups: int = luigi.IntParameter(default=4)
+    size_scale: float = luigi.FloatParameter(default=1.0)
 
     def requires(self) -> list[TransformStats]:
         return [
-            TransformStats(group_id=i, n_groups=self.n_groups)
+            TransformStats(
+                group_id=i, n_groups=self.n_groups, size_scale=self.size_scale
+            )
             for i in range(self.n_groups)
         ]
 
     def output(self) -> luigi.LocalTarget:
-        return luigi.LocalTarget(SCRATCH_DIR / "summary.json")
+        return luigi.LocalTarget(RUN.output_path(self.stage, None))
 
-    def run(self) -> None:
-        transformed_list = []
-        for target in self.input():
-            with target.open() as fh:
-                transformed_list.append(json.load(fh))
+    def checkpoint_input(self) -> dict:
+        return {"n_groups": self.n_groups, "size_scale": self.size_scale}
 
-        summary = aggregate_results(transformed_list)
+    def run(self) -> None:
+        # Fold each partition into the aggregator as it is mapped rather
+        # than buffering all N records, so memory stays flat however many
+        # groups there are.
+        with span("aggregate_results", self.n_groups) as traced_call:
+            aggregator = ResultAggregator()
+            for target in self.input():
+                for record in target.read().to_pylist():
+                    aggregator.update(record)
+            summary = traced_call["result"] = aggregator.result()
 
         with self.output().open("w") as fh:
             json.dump(summary, fh, indent=2)
+        RUN.record(self.stage, None, self.checkpoint_input(), self.output().path)
 
         print("Pipeline complete.")
         for key, value in summary.items():
             print(f"  {key}: {value}")
 
-        # Comment out the next line to keep intermediate files for inspection.
-        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
-
 
 # ---------------------------------------------------------------------------
 # Entry point